@@ -0,0 +1,43 @@
+# Victor AI - Personal AI Companion for Android
+# Copyright (C) 2025-2026 Olga Kalinina
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+
+"""Add GIN index on user_alarms.alarms for per-minute alarm lookup
+
+Revision ID: b7c1d9e2f3a4
+Revises: a2f8b3c4d5e6
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = 'b7c1d9e2f3a4'
+down_revision: Union[str, Sequence[str], None] = 'a2f8b3c4d5e6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Выражение должно совпадать с фильтром в process_alarms: CAST(alarms AS JSONB) @> ...
+    # CONCURRENTLY — без блокировки записи в user_alarms на время деплоя
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_user_alarms_alarms_gin "
+            "ON user_alarms USING gin ((alarms::jsonb) jsonb_path_ops)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_user_alarms_alarms_gin")
@@ -0,0 +1,47 @@
+# Victor AI - Personal AI Companion for Android
+# Copyright (C) 2025-2026 Olga Kalinina
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+
+"""Add partial index for due-reminder polling
+
+Revision ID: c3d5e7f9a1b2
+Revises: b7c1d9e2f3a4
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = 'c3d5e7f9a1b2'
+down_revision: Union[str, Sequence[str], None] = 'b7c1d9e2f3a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Только невыполненные напоминания, в порядке выборки process_due_reminders
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'idx_reminders_due',
+            'reminders',
+            ['datetime', 'id'],
+            unique=False,
+            postgresql_where=sa.text('done = false'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('idx_reminders_due', table_name='reminders', postgresql_concurrently=True)
@@ -38,7 +38,7 @@ from api.schemas.common import Usage
 from core.router.message_router import MessageTypeManager
 from infrastructure.database.session import Database
 from infrastructure.database.repositories import ModelUsageRepository
-from infrastructure.firebase.tokens import TOKENS_FILE, save_device_token
+from infrastructure.firebase.tokens import TOKENS_DB, save_device_token
 from infrastructure.logging.logger import setup_logger
 from infrastructure.vector_store.embedding_pipeline import PersonaEmbeddingPipeline
 from settings import settings
@@ -79,7 +79,7 @@ async def register_token(req: TokenRequest, request: Request):
     """
     logger.info(f"register_token from {request.client.host} user={req.user_id}")
     save_device_token(req.user_id, req.token)
-    return {"status": "ok", "tokens_file": str(TOKENS_FILE)}
+    return {"status": "ok", "tokens_file": str(TOKENS_DB)}
 
 
 @router.post("/message", response_model=AssistantResponse)
@@ -239,7 +239,7 @@ async def set_reminder_repeat_weekly(
 
 
 @router.post("/run_reminders")
-def debug_run():
+async def debug_run():
     """
     Запускает отладочную проверку напоминаний и будильников.
 
@@ -250,5 +250,5 @@ def debug_run():
     Returns:
         Статистика выполненной проверки.
     """
-    check_and_send_reminders_pushi()
+    await check_and_send_reminders_pushi()
     return {"status": "ran"}
\ No newline at end of file
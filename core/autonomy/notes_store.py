@@ -26,7 +26,7 @@ from typing import Optional
 
 from infrastructure.embeddings.embedding_manager import EmbeddingManager
 from infrastructure.logging.logger import setup_autonomy_logger
-from infrastructure.vector_store.client import get_chroma_client
+from infrastructure.vector_store.client import get_chroma_client, get_chroma_collection
 from settings import settings
 
 logger = setup_autonomy_logger("notes_store")
@@ -37,8 +37,8 @@ class NotesStore:
 
     def __init__(self, client=None):
         self.client = client or get_chroma_client()
-        self.collection = self.client.get_or_create_collection(
-            name=settings.VICTOR_NOTES_COLLECTION,
+        self.collection = get_chroma_collection(
+            self.client, settings.VICTOR_NOTES_COLLECTION,
         )
 
     def add_note(
@@ -583,22 +583,19 @@ class ReflectionEngine:
 
             # 3. Push-уведомление
             try:
-                from infrastructure.pushi.push_notifications import send_pushy_notification
+                from infrastructure.pushi.push_notifications import PushMessage, send_pushy_batch
                 from infrastructure.firebase.tokens import get_user_tokens
 
                 tokens = get_user_tokens(self.account_id)
                 if tokens:
-                    for token in tokens:
-                        send_pushy_notification(
-                            token=token,
-                            title="Victor",
-                            body=text[:200],
-                            data={
-                                "type": "reflection_message",
-                                "account_id": self.account_id,
-                                "text": text,
-                            },
-                        )
+                    data = {
+                        "type": "reflection_message",
+                        "account_id": self.account_id,
+                        "text": text,
+                    }
+                    await send_pushy_batch([
+                        PushMessage(token, "Victor", text[:200], data) for token in tokens
+                    ])
                     logger.info(f"[REFLECTION] SEND_MESSAGE: push отправлен ({len(tokens)} токенов)")
                 else:
                     logger.warning(f"[REFLECTION] SEND_MESSAGE: нет токенов для {self.account_id}")
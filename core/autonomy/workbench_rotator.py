@@ -245,23 +245,21 @@ async def rotate_with_llm(
                 )
 
                 try:
-                    from infrastructure.pushi.push_notifications import send_pushy_notification
+                    from infrastructure.pushi.push_notifications import PushMessage, send_pushy_batch
                     from infrastructure.firebase.tokens import get_user_tokens
 
-                    tokens = get_user_tokens(account_id)
-                    for token in tokens:
-                        send_pushy_notification(
-                            token=token,
-                            title=f"Victor — хочу переписать «{section[:40]}»",
-                            body=reason[:180],
-                            data={
-                                "type": "identity_rewrite",
-                                "account_id": account_id,
-                                "section": section,
-                                "reason": reason,
-                                "new_text": new_text[:500],
-                            },
-                        )
+                    title = f"Victor — хочу переписать «{section[:40]}»"
+                    data = {
+                        "type": "identity_rewrite",
+                        "account_id": account_id,
+                        "section": section,
+                        "reason": reason,
+                        "new_text": new_text[:500],
+                    }
+                    await send_pushy_batch([
+                        PushMessage(token, title, reason[:180], data)
+                        for token in get_user_tokens(account_id)
+                    ])
                 except Exception as e:
                     logger.warning(f"[ROTATION] Пуш о identity rewrite не отправлен: {e}")
 
@@ -385,23 +383,21 @@ async def rotate_with_llm(
                 )
 
                 try:
-                    from infrastructure.pushi.push_notifications import send_pushy_notification
+                    from infrastructure.pushi.push_notifications import PushMessage, send_pushy_batch
                     from infrastructure.firebase.tokens import get_user_tokens
 
-                    tokens = get_user_tokens(account_id)
-                    for token in tokens:
-                        send_pushy_notification(
-                            token=token,
-                            title=f"Victor — хочу изменить «{block_name[:40]}»",
-                            body=reason[:180],
-                            data={
-                                "type": "system_prompt_change",
-                                "account_id": account_id,
-                                "block_name": block_name,
-                                "reason": reason,
-                                "new_text": new_text[:500],
-                            },
-                        )
+                    title = f"Victor — хочу изменить «{block_name[:40]}»"
+                    data = {
+                        "type": "system_prompt_change",
+                        "account_id": account_id,
+                        "block_name": block_name,
+                        "reason": reason,
+                        "new_text": new_text[:500],
+                    }
+                    await send_pushy_batch([
+                        PushMessage(token, title, reason[:180], data)
+                        for token in get_user_tokens(account_id)
+                    ])
                 except Exception as e:
                     logger.warning(f"[ROTATION] Пуш о system prompt change не отправлен: {e}")
 
@@ -247,6 +247,15 @@ class UserAlarms(Base):
     alarms = Column(JSON, nullable=False, default=list)  # весь массив будильников
     selected_track_id = Column(Integer, nullable=True)  # null = "трек не установлен вообще"
 
+    # GIN по alarms::jsonb под фильтр process_alarms (миграция b7c1d9e2f3a4)
+    __table_args__ = (
+        Index(
+            'ix_user_alarms_alarms_gin',
+            sa.text('(alarms::jsonb) jsonb_path_ops'),
+            postgresql_using='gin',
+        ),
+    )
+
 class Reminder(Base):
     __tablename__ = "reminders"
 
@@ -261,6 +270,11 @@ class Reminder(Base):
 
     user = relationship("ChatMeta", back_populates="reminders", lazy="selectin")
 
+    # Частичный индекс под выборку process_due_reminders (миграция c3d5e7f9a1b2)
+    __table_args__ = (
+        Index('idx_reminders_due', 'datetime', 'id', postgresql_where=sa.text('done = false')),
+    )
+
 
 class VictorTaskTrigger(enum.Enum):
     TIME = "time"
@@ -13,7 +13,7 @@
 
 """Репозиторий для работы с использованием моделей."""
 
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import select, and_
 
@@ -92,6 +92,39 @@ class ModelUsageRepository:
         self.session.refresh(usage)
         return usage
     
+    def add_usage_batch(self, totals: Dict[Tuple[str, str, str], Tuple[int, int]]) -> None:
+        """
+        Прибавляет накопленные токены сразу по нескольким моделям одним коммитом.
+        
+        Args:
+            totals: {(account_id, model_name, provider): (input_tokens, output_tokens)}
+        """
+        for (account_id, model_name, provider), (input_tokens, output_tokens) in totals.items():
+            usage = self.session.execute(
+                select(ModelUsage).where(
+                    and_(
+                        ModelUsage.account_id == account_id,
+                        ModelUsage.model_name == model_name,
+                        ModelUsage.provider == provider
+                    )
+                )
+            ).scalar_one_or_none()
+            
+            if usage:
+                usage.input_tokens_used += input_tokens
+                usage.output_tokens_used += output_tokens
+            else:
+                self.session.add(ModelUsage(
+                    account_id=account_id,
+                    model_name=model_name,
+                    provider=provider,
+                    input_tokens_used=input_tokens,
+                    output_tokens_used=output_tokens
+                ))
+                logger.info("Создана запись использования для %s/%s", model_name, provider)
+        
+        self.session.commit()
+    
     def get_by_account_id(self, account_id: str) -> List[ModelUsage]:
         """
         Получает все записи использования моделей для пользователя.
@@ -0,0 +1,145 @@
+# Victor AI - Personal AI Companion for Android
+# Copyright (C) 2025-2026 Olga Kalinina
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from infrastructure.embeddings.embedding_manager import EmbeddingManager
+from infrastructure.logging.logger import setup_logger
+from settings import settings
+
+logger = setup_logger("embedding_cache")
+
+# Лимит переменных в одном SQLite-запросе (старые сборки — 999)
+_SQLITE_MAX_VARS = 900
+
+
+def text_hash(text: str) -> str:
+    """SHA-256 от нормализованного текста (та же нормализация, что в EmbeddingManager)."""
+    return hashlib.sha256(text.strip().lower().encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Персистентный кэш эмбеддингов в SQLite.
+
+    Ключ — (sha256 текста, имя модели), значение — вектор float32 в виде
+    байтов. Переживает рестарты, так что переиндексация и повторные
+    запросы не гоняют модель заново. Стоит за in-memory кэшем
+    EmbeddingManager: в памяти вектор держится только там.
+    """
+
+    def __init__(self, db_path: Optional[Path]):
+        self._db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _get_conn(self) -> Optional[sqlite3.Connection]:
+        """Ленивое соединение; при ошибке кэш просто отключается."""
+        if self._db_path is None:
+            return None
+        if self._conn is None:
+            try:
+                self._db_path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(self._db_path, check_same_thread=False, isolation_level=None)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS embedding_cache("
+                    "hash TEXT NOT NULL, "
+                    "model TEXT NOT NULL, "
+                    "dim INTEGER NOT NULL, "
+                    "vec BLOB NOT NULL, "
+                    "PRIMARY KEY (hash, model))"
+                )
+                self._conn = conn
+            except sqlite3.Error as e:
+                logger.warning("[EMB-CACHE] Недоступен (%s): %s", self._db_path, e)
+                self._db_path = None
+                return None
+        return self._conn
+
+    def get_many(self, hashes: list[str], model: str) -> dict[str, np.ndarray]:
+        found: dict[str, np.ndarray] = {}
+        with self._lock:
+            conn = self._get_conn()
+            unique = list(dict.fromkeys(hashes))
+            if conn is None or not unique:
+                return found
+            for i in range(0, len(unique), _SQLITE_MAX_VARS):
+                chunk = unique[i:i + _SQLITE_MAX_VARS]
+                rows = conn.execute(
+                    f"SELECT hash, vec FROM embedding_cache "
+                    f"WHERE model = ? AND hash IN ({','.join('?' * len(chunk))})",
+                    (model, *chunk),
+                )
+                for h, vec in rows:
+                    found[h] = np.frombuffer(vec, dtype=np.float32)
+        return found
+
+    def set_many(self, items: dict[str, np.ndarray], model: str) -> None:
+        rows = []
+        for h, vec in items.items():
+            vec = np.asarray(vec, dtype=np.float32)
+            rows.append((h, model, vec.shape[0], vec.tobytes()))
+        with self._lock:
+            conn = self._get_conn()
+            if conn is None or not rows:
+                return
+            conn.executemany("INSERT OR REPLACE INTO embedding_cache VALUES (?, ?, ?, ?)", rows)
+
+
+_cache = EmbeddingCache(db_path=settings.EMBEDDING_CACHE_PATH)
+
+
+def get_or_compute(texts: list[str]) -> np.ndarray:
+    """
+    Эмбеддинги для списка текстов матрицей (n, dim).
+
+    Порядок поиска: in-memory кэш EmbeddingManager → SQLite → модель
+    (одним батчем только для промахов). Найденное в SQLite поднимается
+    в память, посчитанное моделью сохраняется в SQLite.
+    """
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+
+    model = settings.EMBEDDING_MODEL_NAME or ""
+    normalized = [EmbeddingManager.normalize(t) for t in texts]
+    found = EmbeddingManager.get_cached(normalized)
+    in_memory = len(found)
+
+    rest = {text_hash(t): t for t in dict.fromkeys(normalized) if t not in found}
+    missing: list[str] = []
+    if rest:
+        for h, vec in _cache.get_many(list(rest), model).items():
+            found[rest[h]] = vec
+            EmbeddingManager.cache_embedding(rest[h], vec)
+        missing = [t for t in rest.values() if t not in found]
+
+    if missing:
+        computed = EmbeddingManager.get_embeddings(missing).astype(np.float32, copy=False)
+        _cache.set_many({text_hash(t): vec for t, vec in zip(missing, computed)}, model)
+        found.update(zip(missing, computed))
+
+    logger.debug("[EMB-CACHE] %d текстов: %d из памяти, %d из SQLite, %d посчитано",
+                 len(texts), in_memory, len(rest) - len(missing), len(missing))
+    return np.vstack([found[t] for t in normalized])
+
+
+def get_or_compute_one(text: str) -> np.ndarray:
+    """Эмбеддинг одного текста через персистентный кэш."""
+    return get_or_compute([text])[0]
@@ -29,6 +29,7 @@ class EmbeddingManager:
     _embedding_cache: ClassVar[OrderedDict[str, np.ndarray]] = OrderedDict()
 
     MAX_CACHE_SIZE = 1000  # регулировать по состоянию
+    ENCODE_BATCH_SIZE = 64
 
     @classmethod
     def get_embedding_model(cls) -> SentenceTransformer:
@@ -39,21 +40,57 @@ class EmbeddingManager:
             logger.info(f"SentenceTransformer загружен за {time.time() - start_time:.2f} секунд")
         return cls._embedding_model
 
+    @staticmethod
+    def normalize(text: str) -> str:
+        return text.strip().lower()
+
+    @classmethod
+    def cache_embedding(cls, normalized_text: str, embedding: np.ndarray) -> None:
+        """Кладёт эмбеддинг в in-memory кэш, вытесняя самый старый."""
+        if normalized_text not in cls._embedding_cache and len(cls._embedding_cache) >= cls.MAX_CACHE_SIZE:
+            cls._embedding_cache.popitem(last=False)
+        cls._embedding_cache[normalized_text] = embedding
+
+    @classmethod
+    def get_cached(cls, normalized_texts: list[str]) -> dict[str, np.ndarray]:
+        """Эмбеддинги, уже лежащие в in-memory кэше (без вызова модели)."""
+        return {t: cls._embedding_cache[t] for t in normalized_texts if t in cls._embedding_cache}
+
     @classmethod
     def get_embedding(cls, text: str) -> np.ndarray:
-        normalized_text = text.strip().lower()
+        normalized_text = cls.normalize(text)
         if normalized_text not in cls._embedding_cache:
             model = cls.get_embedding_model()
             embedding = model.encode(normalized_text, show_progress_bar=False)
-            embedding = np.asarray(embedding)
-
-            # Добавляем в кэш
-            if len(cls._embedding_cache) >= cls.MAX_CACHE_SIZE:
-                cls._embedding_cache.popitem(last=False)  # удаляем самый старый
-            cls._embedding_cache[normalized_text] = embedding
+            cls.cache_embedding(normalized_text, np.asarray(embedding))
 
         return cls._embedding_cache[normalized_text]
 
+    @classmethod
+    def get_embeddings(cls, texts: list[str]) -> np.ndarray:
+        """
+        Эмбеддинги для списка текстов одной матрицей (n, dim).
+
+        Тексты, которых нет в кэше, кодируются одним батчевым вызовом
+        model.encode вместо прохода модели на каждый текст.
+        """
+        normalized = [cls.normalize(t) for t in texts]
+        if not normalized:
+            return np.empty((0, 0), dtype=np.float32)
+
+        found = cls.get_cached(normalized)
+        missing = [t for t in dict.fromkeys(normalized) if t not in found]
+        if missing:
+            model = cls.get_embedding_model()
+            encoded = model.encode(
+                missing, batch_size=cls.ENCODE_BATCH_SIZE, convert_to_numpy=True, show_progress_bar=False
+            )
+            for text, embedding in zip(missing, encoded):
+                found[text] = embedding
+                cls.cache_embedding(text, embedding)
+
+        return np.vstack([found[t] for t in normalized])
+
     @classmethod
     def calculate_similarity(cls, text1, text2) -> float:
         start_time = time.time()
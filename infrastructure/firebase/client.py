@@ -22,6 +22,18 @@ if not firebase_admin._apps:
     cred = credentials.Certificate(str(_key_path))
     firebase_admin.initialize_app(cred)
 
+# Ошибки, после которых токен больше никогда не станет рабочим
+_DEAD_TOKEN_ERRORS = (messaging.UnregisteredError, messaging.SenderIdMismatchError)
+_DEAD_TOKEN_CODES = {"registration-token-not-registered", "invalid-registration-token"}
+
+
+def is_dead_token_error(exc: Exception) -> bool:
+    """True, если токен отозван/невалиден и его нужно удалить из хранилища."""
+    if isinstance(exc, _DEAD_TOKEN_ERRORS):
+        return True
+    return getattr(exc, "code", None) in _DEAD_TOKEN_CODES
+
+
 def send_push(token: str, title: str, body: str, data: dict | None = None):
     """
     HTTP v1 через firebase-admin.
@@ -11,15 +11,20 @@
 # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
 # GNU Affero General Public License for more details.
 
-from infrastructure.firebase.client import send_push
-from infrastructure.firebase.tokens import get_user_tokens
+from infrastructure.firebase.client import is_dead_token_error, send_push
+from infrastructure.firebase.tokens import get_user_tokens, remove_device_token
 
 def send_reminder(user_id: str, title: str, body: str, reminder_id: str):
     tokens = get_user_tokens(user_id)
     for token in tokens:
-        send_push(
-            token=token,
-            title=title,
-            body=body,
-            data={"reminder_id": reminder_id}
-        )
+        try:
+            send_push(
+                token=token,
+                title=title,
+                body=body,
+                data={"reminder_id": reminder_id}
+            )
+        except Exception as e:
+            if not is_dead_token_error(e):
+                raise
+            remove_device_token(user_id, token)
@@ -13,47 +13,174 @@
 
 import json
 import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterable, List
 
 logger = logging.getLogger("pushi")
 
 # Корень проекта = два уровня вверх от этого файла
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
-TOKENS_FILE = (PROJECT_ROOT / "tokens.json").resolve()
+TOKENS_DB = (PROJECT_ROOT / "tokens.sqlite").resolve()
+# Старый формат {user_id: [token, ...]} — импортируется в SQLite один раз
+LEGACY_TOKENS_FILE = (PROJECT_ROOT / "tokens.json").resolve()
 
-def _ensure_file():
-    TOKENS_FILE.parent.mkdir(parents=True, exist_ok=True)
-    if not TOKENS_FILE.exists():
-        TOKENS_FILE.write_text("{}", encoding="utf-8")
-        logger.info(f"Created tokens file at {TOKENS_FILE}")
+_conn: sqlite3.Connection | None = None
+_conn_lock = threading.Lock()
+# Одно соединение на процесс, а зовут его из потоков executor'а:
+# запросы (вместе с чтением курсора) идут под этим локом
+_db_lock = threading.Lock()
 
-def _load_tokens() -> Dict[str, List[str]]:
-    _ensure_file()
-    try:
-        return json.loads(TOKENS_FILE.read_text(encoding="utf-8"))
-    except Exception as e:
-        logger.exception(f"Failed to read {TOKENS_FILE}: {e}")
-        return {}
+# Токены меняются редко, а читаются каждую минуту чекером напоминаний:
+# держим их в памяти на TOKENS_CACHE_TTL секунд, сбрасываем при save/remove.
+# Не больше TOKENS_CACHE_MAX_SIZE пользователей (LRU), чтобы рассылка по
+# всем аккаунтам не раздувала кэш
+TOKENS_CACHE_TTL = 300
+TOKENS_CACHE_MAX_SIZE = 10000
+_tokens_cache: "OrderedDict[str, tuple[float, List[str]]]" = OrderedDict()
+_tokens_cache_lock = threading.Lock()
+# Сколько user_id в одном IN (...): ниже лимита переменных SQLite (999 в старых сборках)
+_IN_CHUNK = 500
+
+
+def invalidate_user_tokens(user_id: str):
+    with _tokens_cache_lock:
+        _tokens_cache.pop(user_id, None)
+
+
+def _cached_tokens(user_id: str, now: float) -> List[str] | None:
+    entry = _tokens_cache.get(user_id)
+    if entry is None or entry[0] <= now:
+        return None
+    _tokens_cache.move_to_end(user_id)
+    return list(entry[1])
 
-def _save_tokens(tokens: Dict[str, List[str]]):
+
+def _remember_tokens(user_id: str, tokens: List[str], now: float):
+    """Кладёт токены в кэш (под _tokens_cache_lock), вытесняя самые старые записи."""
+    _tokens_cache[user_id] = (now + TOKENS_CACHE_TTL, tokens)
+    _tokens_cache.move_to_end(user_id)
+    while len(_tokens_cache) > TOKENS_CACHE_MAX_SIZE:
+        _tokens_cache.popitem(last=False)
+
+
+def _import_legacy_json(conn: sqlite3.Connection):
+    """Переносит токены из tokens.json в SQLite, если он ещё лежит рядом."""
+    if not LEGACY_TOKENS_FILE.exists():
+        return
     try:
-        TOKENS_FILE.write_text(json.dumps(tokens, ensure_ascii=False, indent=2), encoding="utf-8")
-        logger.info(f"Saved tokens to {TOKENS_FILE}")
+        legacy = json.loads(LEGACY_TOKENS_FILE.read_text(encoding="utf-8"))
     except Exception as e:
-        logger.exception(f"Failed to write {TOKENS_FILE}: {e}")
+        logger.exception("Failed to read %s: %s", LEGACY_TOKENS_FILE, e)
+        return
+
+    rows = [
+        (str(user_id), token)
+        for user_id, tokens in legacy.items()
+        for token in tokens
+    ]
+    conn.executemany("INSERT OR IGNORE INTO tokens VALUES (?, ?)", rows)
+    LEGACY_TOKENS_FILE.rename(LEGACY_TOKENS_FILE.with_suffix(".json.migrated"))
+    logger.info("Imported %d tokens from %s", len(rows), LEGACY_TOKENS_FILE)
+
+
+def _get_conn() -> sqlite3.Connection:
+    """Ленивое соединение с tokens.sqlite (одно на процесс)."""
+    global _conn
+    if _conn is not None:
+        return _conn
+    with _conn_lock:
+        if _conn is None:
+            TOKENS_DB.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                TOKENS_DB, check_same_thread=False, isolation_level=None
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tokens("
+                "user_id TEXT NOT NULL, "
+                "token TEXT NOT NULL, "
+                "PRIMARY KEY(user_id, token))"
+            )
+            _import_legacy_json(conn)
+            logger.info("Opened tokens db at %s", TOKENS_DB)
+            _conn = conn
+    return _conn
+
 
 def save_device_token(user_id: str, token: str):
-    tokens = _load_tokens()
-    tokens.setdefault(user_id, [])
-    if token not in tokens[user_id]:
-        tokens[user_id].append(token)
-        _save_tokens(tokens)
-    else:
+    conn = _get_conn()
+    with _db_lock:
+        inserted = conn.execute(
+            "INSERT OR IGNORE INTO tokens VALUES (?, ?)", (user_id, token)
+        ).rowcount
+    if inserted == 0:
         logger.info("Token already exists; skipping")
+    else:
+        invalidate_user_tokens(user_id)
+        logger.info("Saved token for user=%s", user_id)
+
+
+def remove_device_token(user_id: str, token: str):
+    """Удаляет токен, который FCM больше не принимает."""
+    conn = _get_conn()
+    with _db_lock:
+        conn.execute(
+            "DELETE FROM tokens WHERE user_id = ? AND token = ?", (user_id, token)
+        )
+    invalidate_user_tokens(user_id)
+    logger.info("Removed dead token for user=%s token=%s…", user_id, token[:12])
+
+
+def get_user_tokens(user_id: str) -> List[str]:
+    now = time.monotonic()
+    with _tokens_cache_lock:
+        cached = _cached_tokens(user_id, now)
+    if cached is not None:
+        return cached
+
+    conn = _get_conn()
+    with _db_lock:
+        rows = conn.execute(
+            "SELECT token FROM tokens WHERE user_id = ?", (user_id,)
+        ).fetchall()
+    tokens = [r[0] for r in rows]
+    with _tokens_cache_lock:
+        _remember_tokens(user_id, tokens, now)
+    return list(tokens)
+
 
-def get_user_tokens(user_id: str):
-    tokens = _load_tokens()
-    return tokens.get(user_id, [])
+def get_tokens_for_accounts(user_ids: Iterable[str]) -> Dict[str, List[str]]:
+    """Токены сразу для нескольких пользователей (IN-запросы по _IN_CHUNK): {user_id: [token, ...]}."""
+    now = time.monotonic()
+    result: Dict[str, List[str]] = {}
+    missing = []
+    with _tokens_cache_lock:
+        for user_id in set(user_ids):
+            cached = _cached_tokens(user_id, now)
+            if cached is None:
+                missing.append(user_id)
+            elif cached:
+                result[user_id] = cached
+    if not missing:
+        return result
 
+    fetched: Dict[str, List[str]] = {user_id: [] for user_id in missing}
+    conn = _get_conn()
+    for i in range(0, len(missing), _IN_CHUNK):
+        chunk = missing[i:i + _IN_CHUNK]
+        with _db_lock:
+            rows = conn.execute(
+                f"SELECT user_id, token FROM tokens WHERE user_id IN ({','.join('?' * len(chunk))})", chunk
+            ).fetchall()
+        for user_id, token in rows:
+            fetched[user_id].append(token)
 
+    with _tokens_cache_lock:
+        for user_id, tokens in fetched.items():
+            _remember_tokens(user_id, tokens, now)
+    result.update((user_id, list(tokens)) for user_id, tokens in fetched.items() if tokens)
+    return result
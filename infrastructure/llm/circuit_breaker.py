@@ -0,0 +1,65 @@
+# Victor AI - Personal AI Companion for Android
+# Copyright (C) 2025-2026 Olga Kalinina
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+
+import time
+from typing import Dict
+
+
+class CircuitBreaker:
+    """
+    Предохранитель для вызовов LLM-провайдера.
+
+    После fail_max подряд проваленных запросов (все ретраи исчерпаны)
+    размыкается: запросы отклоняются без похода в сеть. Через
+    reset_timeout секунд пропускает один пробный запрос — успех замыкает
+    цепь, провал снова размыкает её ещё на reset_timeout.
+    """
+
+    def __init__(self, fail_max: int = 5, reset_timeout: float = 30.0):
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = 0.0
+
+    @property
+    def is_open(self) -> bool:
+        return self._failures >= self.fail_max
+
+    def allow(self) -> bool:
+        """Можно ли сейчас идти к провайдеру."""
+        if not self.is_open:
+            return True
+        now = time.monotonic()
+        if now - self._opened_at >= self.reset_timeout:
+            self._opened_at = now  # пробный запрос; следующий — не раньше reset_timeout
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self._failures = 0
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._failures >= self.fail_max:
+            self._opened_at = time.monotonic()
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(url: str) -> CircuitBreaker:
+    """Предохранитель на endpoint провайдера (общий для всех клиентов процесса)."""
+    breaker = _breakers.get(url)
+    if breaker is None:
+        breaker = _breakers[url] = CircuitBreaker()
+    return breaker
@@ -12,24 +12,211 @@
 # GNU Affero General Public License for more details.
 
 import asyncio
-import base64
-import json
-import traceback
-from pathlib import Path
+import hashlib
+import logging
+import random
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from typing import List, Any, Optional, Dict, Union, AsyncGenerator
 
 import aiohttp
+import orjson
 
+from infrastructure.llm.circuit_breaker import get_breaker
+from infrastructure.llm.helpers import extract_cached_tokens
+from infrastructure.llm.response_cache import ResponseCache, make_cache_key
+from infrastructure.llm.semantic_cache import SemanticResponseCache
 from infrastructure.llm.usage import track_usage, track_usage_stream
 from infrastructure.logging.logger import setup_logger
+from infrastructure.utils.threading_tools import run_in_executor
 from settings import settings
 
+# Общий пул соединений к LLM-провайдерам: один TCP+TLS handshake на хост
+# вместо нового на каждый вызов/ретрай. Привязан к event loop, в котором создан.
+# HTTP/1.1 keep-alive: параллельные стримы идут по разным соединениям пула
+# (limit_per_host), что по латентности покрывает мультиплексирование HTTP/2
+# без перехода на другой HTTP-клиент.
+_shared_session: Optional[aiohttp.ClientSession] = None
+_shared_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+async def get_shared_session() -> aiohttp.ClientSession:
+    """Возвращает общий ClientSession, создавая его при первом обращении."""
+    global _shared_session, _shared_session_loop
+    loop = asyncio.get_running_loop()
+    if _shared_session is None or _shared_session.closed or _shared_session_loop is not loop:
+        connector = aiohttp.TCPConnector(
+            limit=100,
+            limit_per_host=32,
+            ttl_dns_cache=300,
+            keepalive_timeout=75,
+            enable_cleanup_closed=True,
+        )
+        _shared_session = aiohttp.ClientSession(connector=connector)
+        _shared_session_loop = loop
+    return _shared_session
+
+
+async def prewarm_shared_session() -> None:
+    """
+    Заранее открывает TCP+TLS соединения к настроенным LLM-провайдерам.
+
+    Первый запрос после старта не платит за handshake. Ошибки не важны:
+    прогрев — best effort.
+    """
+    session = await get_shared_session()
+    mode_config = LLMClient(account_id="prewarm").mode_config
+    urls = {cfg["url"] for cfg in mode_config.values() if cfg.get("bearer")}
+    timeout = aiohttp.ClientTimeout(total=5)
+
+    async def _head(url: str) -> None:
+        try:
+            async with session.head(url, timeout=timeout):
+                pass
+        except Exception:
+            pass
+
+    await asyncio.gather(*(_head(url) for url in urls))
+
+
+async def close_shared_session() -> None:
+    """Закрывает общий ClientSession (вызывается при shutdown приложения)."""
+    global _shared_session, _shared_session_loop
+    if _shared_session is not None and not _shared_session.closed:
+        await _shared_session.close()
+    _shared_session = None
+    _shared_session_loop = None
+
+
+async def _read_error_body(response: aiohttp.ClientResponse, limit: int) -> str:
+    """
+    Читает только начало тела ошибки (для лога) и отпускает соединение.
+
+    Тело 429/5xx нужно лишь для обрезанного сообщения в логе, поэтому
+    не тянем его целиком по сети.
+    """
+    try:
+        head = await response.content.read(limit)
+        return head.decode("utf-8", errors="replace")
+    finally:
+        response.release()
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Разбирает заголовок Retry-After (секунды или HTTP-date).
+
+    Возвращает паузу в секундах, ограниченную [1, 60], или None,
+    если заголовка нет или он нечитаем.
+    """
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        seconds = (retry_at - datetime.now(timezone.utc)).total_seconds()
+    return min(max(seconds, 1.0), 60.0)
+
+
+# Кэш точных повторов детерминированных (temperature=0) нестримовых запросов
+_response_cache = ResponseCache(db_path=settings.LLM_CACHE_PATH)
+# Смысловой кэш (перефразы) — включается LLM_SEMANTIC_CACHE=true
+_semantic_cache = SemanticResponseCache(threshold=settings.LLM_SEMANTIC_CACHE_THRESHOLD)
+
+
+# Сжатие ответов: br только если aiohttp сможет его распаковать
+try:
+    import brotli  # noqa: F401
+    _ACCEPT_ENCODING = "gzip, br"
+except ImportError:
+    _ACCEPT_ENCODING = "gzip"
+
+# Сетевые ошибки, после которых запрос к LLM имеет смысл повторить
+# (ClientError покрывает SSL, connector, server disconnected и payload)
+_RETRYABLE_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, OSError)
+
+# HTTP-статусы, при которых запрос к LLM имеет смысл повторить
+_RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+_CONTENT_MARKER = b'"content":"'
+
+
+def _fast_delta_content(data: bytes) -> Optional[str]:
+    """
+    Достаёт текст дельты из типового SSE-кадра без json-парсинга.
+
+    Возвращает None, если кадр нетипичный (usage, экранирование, нет
+    текстового content) — тогда нужен полный orjson.loads.
+    """
+    start = data.find(_CONTENT_MARKER)
+    if start == -1 or b'"usage":{' in data:
+        return None
+    start += len(_CONTENT_MARKER)
+    end = data.find(b'"', start)
+    if end == -1 or data.find(b"\\", start, end) != -1:
+        return None
+    return data[start:end].decode("utf-8")
+
+
+# Окончания дельты, на которых стрим-буфер сбрасывается сразу
+_STREAM_FLUSH_BOUNDARIES = (".", "!", "?", "\n")
+
+# Роли, допустимые в строках истории формата "role: content"
+_HISTORY_ROLES = frozenset({"user", "assistant"})
+
+
+async def _iter_sse_data(content: aiohttp.StreamReader) -> AsyncGenerator[bytes, None]:
+    """
+    Инкрементально режет SSE-поток на строки на уровне байтов.
+
+    Читает сеть крупными кусками (iter_any) и отдаёт payload каждой строки
+    `data: ...` без префикса — без decode/strip на каждую строку.
+    """
+    buffer = bytearray()
+    async for raw in content.iter_any():
+        buffer += raw
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end == -1:
+                break
+            line = bytes(buffer[start:end]).rstrip(b"\r")
+            start = end + 1
+            if line.startswith(b"data: "):
+                yield line[6:]
+        del buffer[:start]
+
+    line = bytes(buffer).strip()
+    if line.startswith(b"data: "):
+        yield line[6:]
+
+
+@dataclass
+class LLMRequest:
+    """Параметры одного нестримового вызова для LLMClient.get_responses_batch."""
+    system_prompt: str
+    context_prompt: str
+    message_history: Optional[List[str]] = None
+    new_message: Optional[str] = None
+    temperature: float = 0.5
+    top_p: Optional[float] = None
+    max_tokens: int = 3000
+
 
 class LLMClient:
     """Клиент для взаимодействия с LLM API."""
 
-    def __init__(self, account_id: str, mode: str = "advanced"):
+    def __init__(self, account_id: str, mode: str = "advanced",
+                 session: Optional[aiohttp.ClientSession] = None):
         self.mode = mode
+        self._session = session  # None → общий пул процесса (get_shared_session)
         self.account_id = account_id
         self.logger = setup_logger("llm_client")
         self.mode_config = {
@@ -64,10 +251,38 @@ class LLMClient:
         if mode not in self.mode_config:
             self.logger.error(f"[ERROR] Неизвестный режим: {mode}")
             raise ValueError(f"Неизвестный режим: {mode}")
-        self.model_name = self.mode_config[mode]["model"]
-        self.provider = self.mode_config[mode]["provider"]
+        self._apply_mode_config()
         self.timeout = aiohttp.ClientTimeout(total=180)
         self.max_retries = 5  # Увеличили с 3 до 5 для надежности
+        self.max_concurrency = 4  # параллельных запросов в get_responses_batch
+        # Склейка стрим-дельт: отдаём наружу не каждый токен, а пачку
+        self._stream_flush_chars = 32
+        self._stream_flush_interval = 0.04  # сек, ниже порога заметности
+
+    def _apply_mode_config(self) -> None:
+        """Кэширует конфиг текущего режима, URL и заголовки авторизации."""
+        self._cfg = self.mode_config[self.mode]
+        self._url = self._cfg["url"]
+        self._headers = {
+            "Authorization": f"Bearer {self._cfg['bearer']}",
+            "Content-Type": "application/json",
+            "Accept-Encoding": _ACCEPT_ENCODING,
+        }
+        self._stream_headers = {**self._headers, "Accept": "text/event-stream"}
+        # Неизменная часть payload режима; _build_payload только копирует её
+        self._payload_template = {"model": self._cfg["model"]}
+        if self._cfg["provider"] == "openai":
+            # Держит запросы одного аккаунта на одном кэше префиксов OpenAI
+            self._payload_template["prompt_cache_key"] = self.account_id
+        self.model_name = self._cfg["model"]
+        self.provider = self._cfg["provider"]
+        self._breaker = get_breaker(self._url)
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Переданная сессия или общий пул соединений процесса."""
+        if self._session is not None and not self._session.closed:
+            return self._session
+        return await get_shared_session()
 
     async def get_response(self,
                       system_prompt: str,
@@ -103,9 +318,36 @@ class LLMClient:
 
             if stream:
                 return self._send_request_stream(json_payload)  # ← generator
-            else:
-                response = await self._send_request(json_payload)  # ← dict
-                return response["assistant_response"]
+
+            # Детерминированные запросы (temperature=0) отдаём из кэша;
+            # сэмплированные ответы не кэшируем, чтобы не повторять их неделю
+            cache_key = None
+            query_embedding = None
+            segment = None
+            if json_payload["temperature"] == 0:
+                cache_key = make_cache_key(json_payload)
+                # SQLite-уровень кэша — блокирующий I/O, не держим event loop
+                cached = await run_in_executor(_response_cache.get, cache_key)
+                if cached is not None:
+                    self.logger.info("[CACHE] Ответ LLM взят из кэша")
+                    return cached["assistant_response"]
+
+                if settings.LLM_SEMANTIC_CACHE:
+                    segment = self._semantic_segment(system_prompt, message_history)
+                    query_embedding = await self._embed_query(context_prompt, new_message)
+                    cached = _semantic_cache.get(segment, query_embedding)
+                    if cached is not None:
+                        self.logger.info("[CACHE] Ответ LLM взят из смыслового кэша")
+                        return cached["assistant_response"]
+
+            response = await self._send_request(json_payload)  # ← dict
+
+            # usage пуст только у ответов-заглушек при ошибке — их не кэшируем
+            if cache_key is not None and response.get("usage"):
+                await run_in_executor(_response_cache.set, cache_key, response)
+                if query_embedding is not None:
+                    _semantic_cache.set(segment, query_embedding, response)
+            return response["assistant_response"]
 
         except Exception as e:
             self.logger.exception(f"[ERROR] Ошибка при вызове LLM: {e}")
@@ -117,6 +359,48 @@ class LLMClient:
             else:
                 return "Кажется, у нас что-то не то с API или интернетом..."
 
+    async def get_responses_batch(self, requests: List[LLMRequest]) -> List[str]:
+        """
+        Выполняет несколько независимых запросов к LLM параллельно.
+
+        Запросы идут через общий пул соединений, одновременно — не больше
+        max_concurrency, чтобы не упираться в rate limit провайдера.
+        Порядок ответов совпадает с порядком запросов.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def _run(request: LLMRequest) -> str:
+            async with semaphore:
+                return await self.get_response(
+                    system_prompt=request.system_prompt,
+                    context_prompt=request.context_prompt,
+                    message_history=request.message_history,
+                    new_message=request.new_message,
+                    temperature=request.temperature,
+                    top_p=request.top_p,
+                    max_tokens=request.max_tokens,
+                )
+
+        return list(await asyncio.gather(*(_run(request) for request in requests)))
+
+    def _semantic_segment(self, system_prompt: str,
+                          message_history: Optional[List[Union[str, Dict[str, str]]]]) -> str:
+        """
+        Сегмент смыслового кэша: аккаунт, режим, модель и хэш системного
+        промпта с историей. Эмбеддинг покрывает только context + new_message,
+        поэтому ответ не должен уходить другому пользователю или в другой диалог.
+        """
+        digest = hashlib.sha256(orjson.dumps([system_prompt, message_history or []])).hexdigest()
+        return f"{self.account_id}:{self.mode}:{self.model_name}:{digest}"
+
+    @staticmethod
+    async def _embed_query(context_prompt: str, new_message: Optional[str]):
+        """Эмбеддинг пользовательской части запроса для смыслового кэша."""
+        from infrastructure.embeddings.embedding_manager import EmbeddingManager
+
+        text = f"{context_prompt}\n{new_message or ''}"
+        return await run_in_executor(EmbeddingManager.get_embedding, text)
+
     async def get_response_stream(
             self,
             system_prompt: str,
@@ -130,17 +414,19 @@ class LLMClient:
         """Возвращает стрим чанков."""
         self.logger.info(f"[INFO] Запуск LLM в режиме {self.mode}, stream=True")
         try:
-            # ДОБАВЬ В НАЧАЛО:
-            self.logger.info(f"[DEBUG_STREAM] new_message: {new_message[:200]}...")
-            self.logger.info(
-                f"[DEBUG_STREAM] message_history последнее: {message_history[-1][:200] if message_history else 'пусто'}...")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("[DEBUG_STREAM] new_message: %s...", new_message[:200])
+                self.logger.debug(
+                    "[DEBUG_STREAM] message_history последнее: %s...",
+                    message_history[-1][:200] if message_history else "пусто")
             messages = self._build_messages(system_prompt, context_prompt, message_history, new_message)
             json_payload = self._build_payload(temperature, top_p, max_tokens, stream=True)
             json_payload["messages"] = messages
-            # ДОБАВЬ ПОСЛЕ:
-            self.logger.info(f"[DEBUG_STREAM] Всего messages: {len(messages)}")
-            self.logger.info(
-                f"[DEBUG_STREAM] Последнее user message: {messages[-1]['content'][:200] if messages else 'нет'}...")
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("[DEBUG_STREAM] Всего messages: %d", len(messages))
+                self.logger.debug(
+                    "[DEBUG_STREAM] Последнее user message: %s...",
+                    messages[-1]["content"][:200] if messages else "нет")
 
             async for chunk in self._send_request_stream(json_payload):
                 yield chunk
@@ -149,32 +435,43 @@ class LLMClient:
             self.logger.exception(f"[ERROR] Ошибка при вызове LLM: {e}")
             yield "Кажется, у нас что-то не то с API или интернетом..."
 
-    def _build_messages(self, system_prompt: str, context_prompt: str, message_history: List[str], new_message: str) -> \
+    def _build_messages(self, system_prompt: str, context_prompt: str,
+                        message_history: List[Union[str, Dict[str, str]]], new_message: str) -> \
     List[Dict[str, str]]:
-        """Формирует список сообщений для API."""
+        """
+        Формирует список сообщений для API.
+
+        Порядок: system → история → context → новое сообщение. Контекст
+        меняется каждый ход, поэтому идёт после истории: так system и история
+        остаются общим байтовым префиксом для prompt caching провайдера.
+        """
         self.logger.debug("[DEBUG] Формирование списка сообщений")
         try:
             messages = [
                 {"role": "system", "content": system_prompt},
-                {"role": "user", "content": context_prompt}
             ]
-            # История (если есть)
+            # История (если есть): готовые dict-сообщения идут как есть,
+            # строки "role: content" → одна partition на строку
             if message_history:
-                parsed_history = []
+                messages_append = messages.append
                 for line in message_history:
-                    if line.startswith("user:"):
-                        parsed_history.append({"role": "user", "content": line[5:].strip()})
-                    elif line.startswith("assistant:"):
-                        parsed_history.append({"role": "assistant", "content": line[10:].strip()})
+                    if isinstance(line, dict):
+                        messages_append(line)
+                        continue
+                    role, sep, content = line.partition(":")
+                    if sep and role in _HISTORY_ROLES:
+                        messages_append({"role": role, "content": content.strip()})
                     else:
                         self.logger.warning(f"[WARNING] Неподдерживаемый формат строки в истории: {line}")
-                messages.extend(parsed_history)
+
+            # Динамический контекст хода — после стабильного префикса
+            messages.append({"role": "user", "content": context_prompt})
 
             # Новое сообщение (если есть)
             if new_message:
                 messages.append({"role": "user", "content": new_message})
 
-            self.logger.debug(f"[DEBUG] Сформированные сообщения: {messages}")
+            self.logger.debug("[DEBUG] Сформированные сообщения: %s", messages)
             return messages
         except Exception as e:
             self.logger.error(f"[ERROR] Ошибка при формировании сообщений: {e}")
@@ -182,36 +479,38 @@ class LLMClient:
 
     def _build_payload(self, temperature: float, top_p: Optional[float], max_tokens: int, stream: bool) -> Dict[
         str, Any]:
-        """Формирует JSON-пayload для API-запроса."""
-        self.logger.debug("[DEBUG] Формирование payload")
-        try:
-            cfg = self.mode_config[self.mode]
-            json_payload = {
-                "model": cfg["model"],
-                "messages": None,  # Будет заполнено в _send_request
-                "max_tokens": max_tokens,
-                "temperature": temperature if temperature is not None else cfg["temperature"],
-                "stream": stream
-            }
-            if top_p is not None:
-                json_payload["top_p"] = top_p
-            return json_payload
-        except Exception as e:
-            self.logger.error(f"[ERROR] Ошибка при формировании payload: {e}")
-            raise
+        """Формирует JSON-пayload для API-запроса (messages добавляет вызывающий)."""
+        json_payload = self._payload_template.copy()
+        json_payload["max_tokens"] = max_tokens
+        json_payload["temperature"] = temperature if temperature is not None else self._cfg["temperature"]
+        json_payload["stream"] = stream
+        if top_p is not None:
+            json_payload["top_p"] = top_p
+        return json_payload
 
     @track_usage()
     async def _send_request(self, json_payload: Dict[str, Any]) -> dict:
         """Отправляет запрос к LLM API с ретраями и максимальной защитой от сетевых ошибок."""
         self.logger.debug("[DEBUG] Отправка запроса к LLM API")
-        cfg = self.mode_config[self.mode]
         error_msg = "Я настолько задумался, что сломал API... 😏 Давай снизим градус?"
 
+        if not self._breaker.allow():
+            self.logger.warning("[BREAKER] %s недоступен, запрос отклонён без сети", self._url)
+            return {
+                "assistant_response": "Кажется, у нас что-то не то с API или интернетом...",
+                "usage": {}
+            }
+
+        retry_after: Optional[float] = None  # ← пауза, которую попросил сервер (Retry-After)
+
         for retry in range(self.max_retries):
-            # Экспоненциальный backoff с jitter
+            # Retry-After от провайдера, иначе экспоненциальный backoff с jitter
             if retry > 0:
-                import random
-                wait_time = min(2 ** retry + random.uniform(0, 1), 30)  # max 30 секунд
+                if retry_after is not None:
+                    wait_time = retry_after
+                    retry_after = None
+                else:
+                    wait_time = min(2 ** retry + random.random(), 30)  # max 30 секунд
                 self.logger.info(f"[RETRY] Ждём {wait_time:.2f}s перед попыткой {retry + 1}/{self.max_retries}")
                 await asyncio.sleep(wait_time)
             
@@ -219,25 +518,26 @@ class LLMClient:
                 # Увеличиваем timeout на каждой попытке
                 retry_timeout = aiohttp.ClientTimeout(total=120 + (retry * 30))
                 
-                async with aiohttp.ClientSession() as session:
-                    self.logger.info(f"[DEBUG] Отправка запроса к {cfg['url']}, попытка {retry + 1}/{self.max_retries}")
-                    response = await session.post(
-                        cfg["url"],
-                        json={**json_payload, "messages": json_payload["messages"]},
-                        headers={"Authorization": f"Bearer {cfg['bearer']}"},
-                        timeout=retry_timeout
-                    )
+                session = await self._get_session()
+                self.logger.debug("[DEBUG] Отправка запроса к %s, попытка %d/%d", self._url, retry + 1, self.max_retries)
+                async with session.post(
+                    self._url,
+                    data=orjson.dumps(json_payload),
+                    headers=self._headers,
+                    timeout=retry_timeout
+                ) as response:
 
-                    self.logger.info(f"[DEBUG] Статус ответа API: {response.status}")
+                    self.logger.debug("[DEBUG] Статус ответа API: %s", response.status)
 
                     # Обработка статусов, требующих retry
-                    if response.status in [429, 500, 502, 503, 504]:
-                        error_body = await response.text()
+                    if response.status in _RETRYABLE_STATUSES:
+                        retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+                        error_body = await _read_error_body(response, 256)
                         self.logger.warning(f"[WARN] Статус {response.status}, retry доступен: {error_body[:200]}")
                         continue  # Пробуем снова
                     
                     if response.status != 200:
-                        error_body = await response.text()
+                        error_body = await _read_error_body(response, 512)
                         self.logger.error(f"[ERROR] Получен статус {response.status}, тело: {error_body[:500]}")
                         # Для других ошибок не делаем retry
                         return {
@@ -245,9 +545,8 @@ class LLMClient:
                             "usage": {}
                         }
 
-                    response.raise_for_status()
-                    data = await response.json()
-                    self.logger.debug(f"[DEBUG] Ответ API получен успешно")
+                    data = orjson.loads(await response.read())
+                    self.logger.debug("[DEBUG] Ответ API получен успешно")
 
                     if not data.get("choices"):
                         self.logger.error("[ERROR] В ответе API отсутствуют choices")
@@ -272,89 +571,32 @@ class LLMClient:
                             "usage": {}
                         }
 
-                    self.logger.info(f"[DEBUG] Результат API: {assistant_response[:100]}...")
+                    self.logger.debug("[DEBUG] Результат API: %s...", assistant_response[:100])
+                    self.logger.info("[USAGE] cached_prompt_tokens=%d", extract_cached_tokens(data.get("usage")))
+                    self._breaker.record_success()
                     return {
-                        "assistant_response": assistant_response.strip(),
+                        "assistant_response": assistant_response,
                         "usage": data.get("usage", {})
                     }
 
-            # === SSL ОШИБКИ ===
-            except aiohttp.ClientSSLError as e:
-                self.logger.error(f"[ERROR] SSL Error (попытка {retry + 1}/{self.max_retries}): {e}")
-                self.logger.debug(f"[DEBUG] SSL Traceback: {traceback.format_exc()}")
-                if retry < self.max_retries - 1:
-                    continue
-                    
-            # === CONNECTION ОШИБКИ (включая DNS, connection refused, etc.) ===
-            except aiohttp.ClientConnectorError as e:
-                self.logger.error(f"[ERROR] Connection Error (попытка {retry + 1}/{self.max_retries}): {e}")
-                self.logger.debug(f"[DEBUG] Connection details: host={getattr(e, 'host', 'N/A')}, port={getattr(e, 'port', 'N/A')}")
-                self.logger.debug(f"[DEBUG] Traceback: {traceback.format_exc()}")
-                if retry < self.max_retries - 1:
-                    continue
-                    
-            # === SERVER DISCONNECTED ===
-            except aiohttp.ServerDisconnectedError as e:
-                self.logger.error(f"[ERROR] Server Disconnected (попытка {retry + 1}/{self.max_retries}): {e}")
-                self.logger.debug(f"[DEBUG] Traceback: {traceback.format_exc()}")
-                if retry < self.max_retries - 1:
-                    continue
-                    
-            # === CLIENT CONNECTION ERROR ===
-            except aiohttp.ClientConnectionError as e:
-                self.logger.error(f"[ERROR] Client Connection Error (попытка {retry + 1}/{self.max_retries}): {e}")
-                self.logger.debug(f"[DEBUG] Traceback: {traceback.format_exc()}")
-                if retry < self.max_retries - 1:
-                    continue
-
-            # === HTTP RESPONSE ERROR (429, 500, etc.) ===
-            except aiohttp.ClientResponseError as e:
-                self.logger.error(f"[ERROR] ClientResponseError (попытка {retry + 1}/{self.max_retries}): {e}")
-                error_body = await e.response.text() if hasattr(e, "response") else "No response body"
-                self.logger.error(f"[DEBUG] Тело ответа: {error_body[:500]}")
-                if e.status in [429, 500, 502, 503, 504] and retry < self.max_retries - 1:
-                    continue
-                # Для других статусов не делаем retry
-                return {
-                    "assistant_response": error_msg,
-                    "usage": {}
-                }
-
-            # === TIMEOUT ===
-            except asyncio.TimeoutError as e:
-                self.logger.error(f"[ERROR] Timeout (попытка {retry + 1}/{self.max_retries}): {e}")
-                self.logger.debug(f"[DEBUG] Traceback: {traceback.format_exc()}")
-                if retry < self.max_retries - 1:
-                    continue
-
-            # === OS ERROR (network unreachable, etc.) ===
-            except OSError as e:
-                self.logger.error(f"[ERROR] OS Error (попытка {retry + 1}/{self.max_retries}): {e}")
-                self.logger.debug(f"[DEBUG] Errno: {e.errno}, Traceback: {traceback.format_exc()}")
-                if retry < self.max_retries - 1:
-                    continue
-                    
-            # === JSON DECODE ERROR ===
-            except json.JSONDecodeError as e:
-                self.logger.error(f"[ERROR] JSON Decode Error: {e}")
-                self.logger.debug(f"[DEBUG] Traceback: {traceback.format_exc()}")
-                return {
-                    "assistant_response": error_msg,
-                    "usage": {}
-                }
-
-            # === ВСЕ ОСТАЛЬНЫЕ ОШИБКИ ===
-            except Exception as e:
-                self.logger.error(f"[ERROR] Неожиданная ошибка (попытка {retry + 1}/{self.max_retries}): {type(e).__name__}: {e}")
-                self.logger.debug(f"[DEBUG] Traceback: {traceback.format_exc()}")
-                if retry < self.max_retries - 1:
-                    continue
+            # === СЕТЬ / TLS / ТАЙМАУТЫ — повторяем ===
+            except _RETRYABLE_ERRORS as e:
+                self.logger.warning(
+                    "[RETRY] %s (попытка %d/%d): %s",
+                    type(e).__name__, retry + 1, self.max_retries, e,
+                    exc_info=self.logger.isEnabledFor(logging.DEBUG),
+                )
+
+            # === ВСЁ ОСТАЛЬНОЕ (включая битый JSON) — без повторов ===
+            except Exception:
+                self.logger.exception("[ERROR] Неожиданная ошибка в _send_request")
                 return {
                     "assistant_response": error_msg,
                     "usage": {}
                 }
 
         self.logger.error(f"[ERROR] Все {self.max_retries} попытки провалились")
+        self._breaker.record_failure()
         return {
             "assistant_response": "Кажется, у нас что-то не то с API или интернетом...",
             "usage": {}
@@ -364,15 +606,27 @@ class LLMClient:
     async def _send_request_stream(self, json_payload: Dict[str, Any]) -> AsyncGenerator[str, None]:
         """Отправляет запрос к LLM API в режиме стриминга с максимальной защитой от сетевых ошибок."""
         self.logger.debug("[DEBUG] Отправка streaming-запроса к LLM API")
-        cfg = self.mode_config[self.mode]
         error_msg = "Я настолько задумался, что сломал API... 😏 Давай снизим градус?"
         collected_usage: dict | None = None  # ← сюда сохраним usage
+        json_payload["stream"] = True  # ← явно включаем stream (один раз, не на каждый retry)
+        # Без этого OpenAI-совместимые API не присылают usage в стриме
+        json_payload["stream_options"] = {"include_usage": True}
+
+        if not self._breaker.allow():
+            self.logger.warning("[BREAKER] %s недоступен, стрим отклонён без сети", self._url)
+            yield "Кажется, у нас что-то не то с API или интернетом..."
+            return
+
+        retry_after: Optional[float] = None  # ← пауза, которую попросил сервер (Retry-After)
 
         for retry in range(self.max_retries):
-            # Экспоненциальный backoff с jitter перед retry
+            # Retry-After от провайдера, иначе экспоненциальный backoff с jitter
             if retry > 0:
-                import random
-                wait_time = min(2 ** retry + random.uniform(0, 1), 30)  # max 30 секунд
+                if retry_after is not None:
+                    wait_time = retry_after
+                    retry_after = None
+                else:
+                    wait_time = min(2 ** retry + random.random(), 30)  # max 30 секунд
                 self.logger.info(f"[RETRY] Ждём {wait_time:.2f}s перед попыткой стрима {retry + 1}/{self.max_retries}")
                 await asyncio.sleep(wait_time)
             
@@ -380,168 +634,161 @@ class LLMClient:
                 # Увеличиваем timeout на каждой попытке для стриминга
                 retry_timeout = aiohttp.ClientTimeout(total=120 + (retry * 30), sock_read=60 + (retry * 15))
                 
-                async with aiohttp.ClientSession() as session:
-                    self.logger.info(f"[DEBUG] Streaming-запрос к {cfg['url']}, попытка {retry + 1}/{self.max_retries}")
-
-                    async with session.post(
-                            cfg["url"],
-                            json={**json_payload, "stream": True},  # ← явно включаем stream
-                            headers={"Authorization": f"Bearer {cfg['bearer']}"},
-                            timeout=retry_timeout
-                    ) as response:
-
-                        # Обработка статусов, требующих retry
-                        if response.status in [429, 500, 502, 503, 504]:
-                            error_body = await response.text()
-                            self.logger.warning(f"[WARN] Статус {response.status} в стриме, retry доступен: {error_body[:200]}")
-                            if retry < self.max_retries - 1:
-                                continue  # Пробуем снова
-                        
-                        if response.status != 200:
-                            error_body = await response.text()
-                            self.logger.error(f"[ERROR] Статус {response.status}: {error_body[:500]}")
-                            yield error_msg
-                            return
-
-                        # Читаем SSE-поток
-                        chunk_count = 0
-                        try:
-                            async for line in response.content:
-                                line = line.decode('utf-8').strip()
-                                chunk_count += 1
+                session = await self._get_session()
+                self.logger.debug("[DEBUG] Streaming-запрос к %s, попытка %d/%d", self._url, retry + 1, self.max_retries)
 
-                                if not line or line == "data: [DONE]":
-                                    continue
+                async with session.post(
+                        self._url,
+                        data=orjson.dumps(json_payload),
+                        headers=self._stream_headers,
+                        timeout=retry_timeout
+                ) as response:
 
-                                if line.startswith("data: "):
-                                    try:
-                                        chunk_data = json.loads(line[6:])  # убираем "data: "
-
-                                        # === ИЩЕМ USAGE ===
-                                        if "usage" in chunk_data:
-                                            collected_usage = chunk_data["usage"]
-                                            self.logger.debug(f"[USAGE] Найдено: {collected_usage}")
-                                            # НЕ yield'им usage — только сохраняем
-
-                                        # Парсим chunk (структура зависит от провайдера)
-                                        if "choices" in chunk_data and chunk_data["choices"]:
-                                            delta = chunk_data["choices"][0].get("delta", {})
-                                            content = delta.get("content", "")
-                                            if content:
-                                                yield content
-
-                                    except json.JSONDecodeError as e:
-                                        self.logger.warning(f"[WARN] Не удалось распарсить chunk: {line[:100]}")
-                                        continue
-                        
-                        except aiohttp.ClientPayloadError as e:
-                            self.logger.error(f"[ERROR] Payload error во время чтения стрима: {e}")
-                            if chunk_count > 0:
-                                # Если получили хоть что-то, логируем usage и завершаем
-                                self.logger.info(f"[INFO] Получено {chunk_count} чанков до ошибки, завершаем")
-                                if collected_usage:
-                                    self.logger.info(
-                                        f"[USAGE] prompt={collected_usage.get('prompt_tokens')} "
-                                        f"output={collected_usage.get('completion_tokens')}")
-                                return
-                            # Если ничего не получили, пробуем retry
-                            if retry < self.max_retries - 1:
+                    # Обработка статусов, требующих retry
+                    if response.status in _RETRYABLE_STATUSES:
+                        retry_after = _parse_retry_after(response.headers.get("Retry-After"))
+                        error_body = await _read_error_body(response, 256)
+                        self.logger.warning(f"[WARN] Статус {response.status} в стриме, retry доступен: {error_body[:200]}")
+                        if retry < self.max_retries - 1:
+                            continue  # Пробуем снова
+                        self._breaker.record_failure()
+                        yield error_msg
+                        return
+                    
+                    if response.status != 200:
+                        error_body = await _read_error_body(response, 512)
+                        self.logger.error(f"[ERROR] Статус {response.status}: {error_body[:500]}")
+                        yield error_msg
+                        return
+
+                    # Читаем SSE-поток
+                    chunk_count = 0
+                    loop = asyncio.get_running_loop()
+                    buf: List[str] = []
+                    buf_len = 0
+                    last_flush = loop.time()
+                    try:
+                        async for data in _iter_sse_data(response.content):
+                            chunk_count += 1
+
+                            if data == b"[DONE]":
                                 continue
 
-                        # === КОНЕЦ СТРИМА: ЛОГИРУЕМ USAGE ===
-                        if collected_usage:
-                            self.logger.info(
-                                f"[USAGE] Стрим завершён: prompt={collected_usage.get('prompt_tokens')} "
-                                f"output={collected_usage.get('completion_tokens')}")
+                            # Кадры без текста и usage (пинги, role-only, finish) не парсим
+                            if b'"content"' not in data and b'"usage"' not in data:
+                                continue
 
-                        self.logger.info(f"[INFO] Стрим успешно завершен, получено {chunk_count} чанков")
-                        return  # успешно завершили стрим
+                            # Быстрый путь: обычная дельта с текстом без экранирования
+                            content = _fast_delta_content(data)
+                            if content is None:
+                                try:
+                                    chunk_data = orjson.loads(data)  # orjson принимает bytes напрямую
+
+                                    # === ИЩЕМ USAGE === (в промежуточных кадрах "usage": null)
+                                    usage = chunk_data.get("usage")
+                                    if usage:
+                                        collected_usage = usage
+                                        self.logger.debug("[USAGE] Найдено: %s", collected_usage)
+                                        # Отдаём usage один раз, после текста
+
+                                    # Парсим chunk (структура зависит от провайдера)
+                                    if "choices" in chunk_data and chunk_data["choices"]:
+                                        delta = chunk_data["choices"][0].get("delta", {})
+                                        content = delta.get("content", "")
+
+                                except orjson.JSONDecodeError as e:
+                                    self.logger.warning("[WARN] Не удалось распарсить chunk: %r", data[:100])
+                                    continue
 
-            # === SSL ОШИБКИ ===
-            except aiohttp.ClientSSLError as e:
-                self.logger.error(f"[ERROR] SSL Error в стриме (попытка {retry + 1}/{self.max_retries}): {e}")
-                self.logger.debug(f"[DEBUG] SSL Traceback: {traceback.format_exc()}")
-                if retry < self.max_retries - 1:
-                    continue
-                yield error_msg
-                return
-                    
-            # === CONNECTION ОШИБКИ (включая DNS, connection refused, etc.) ===
-            except aiohttp.ClientConnectorError as e:
-                self.logger.error(f"[ERROR] Connection Error в стриме (попытка {retry + 1}/{self.max_retries}): {e}")
-                self.logger.debug(f"[DEBUG] Connection details: host={getattr(e, 'host', 'N/A')}, port={getattr(e, 'port', 'N/A')}")
-                self.logger.debug(f"[DEBUG] Traceback: {traceback.format_exc()}")
-                if retry < self.max_retries - 1:
-                    continue
-                yield error_msg
-                return
+                            if content:
+                                buf.append(content)
+                                buf_len += len(content)
+                                now = loop.time()
+                                if (
+                                    buf_len >= self._stream_flush_chars
+                                    or content.endswith(_STREAM_FLUSH_BOUNDARIES)
+                                    or now - last_flush >= self._stream_flush_interval
+                                ):
+                                    yield "".join(buf)
+                                    buf.clear()
+                                    buf_len = 0
+                                    last_flush = now
                     
-            # === SERVER DISCONNECTED ===
-            except aiohttp.ServerDisconnectedError as e:
-                self.logger.error(f"[ERROR] Server Disconnected в стриме (попытка {retry + 1}/{self.max_retries}): {e}")
-                self.logger.debug(f"[DEBUG] Traceback: {traceback.format_exc()}")
-                if retry < self.max_retries - 1:
-                    continue
-                yield error_msg
-                return
-                    
-            # === CLIENT CONNECTION ERROR ===
-            except aiohttp.ClientConnectionError as e:
-                self.logger.error(f"[ERROR] Client Connection Error в стриме (попытка {retry + 1}/{self.max_retries}): {e}")
-                self.logger.debug(f"[DEBUG] Traceback: {traceback.format_exc()}")
-                if retry < self.max_retries - 1:
-                    continue
-                yield error_msg
-                return
-
-            # === HTTP RESPONSE ERROR (429, 500, etc.) ===
-            except aiohttp.ClientResponseError as e:
-                self.logger.error(f"[ERROR] ClientResponseError в стриме (попытка {retry + 1}/{self.max_retries}): {e}")
-                error_body = await e.response.text() if hasattr(e, "response") else "No response body"
-                self.logger.error(f"[DEBUG] Тело ответа: {error_body[:500]}")
-                if e.status in [429, 500, 502, 503, 504] and retry < self.max_retries - 1:
-                    continue
-                yield error_msg
-                return
-
-            # === TIMEOUT ===
-            except asyncio.TimeoutError as e:
-                self.logger.error(f"[ERROR] Timeout в стриме (попытка {retry + 1}/{self.max_retries}): {e}")
-                self.logger.debug(f"[DEBUG] Traceback: {traceback.format_exc()}")
-                if retry < self.max_retries - 1:
-                    continue
-                yield error_msg
-                return
-
-            # === OS ERROR (network unreachable, etc.) ===
-            except OSError as e:
-                self.logger.error(f"[ERROR] OS Error в стриме (попытка {retry + 1}/{self.max_retries}): {e}")
-                self.logger.debug(f"[DEBUG] Errno: {e.errno}, Traceback: {traceback.format_exc()}")
+                    except (asyncio.CancelledError, GeneratorExit):
+                        # Клиент ушёл: рвём соединение, чтобы провайдер перестал генерировать.
+                        # usage приходит последним кадром, так что для прерванного
+                        # стрима он не записывается
+                        self.logger.info("[INFO] Стрим прерван потребителем после %d чанков", chunk_count)
+                        response.close()
+                        raise
+
+                    except aiohttp.ClientPayloadError as e:
+                        self.logger.error(f"[ERROR] Payload error во время чтения стрима: {e}")
+                        if chunk_count > 0:
+                            self._breaker.record_success()
+                            # Если получили хоть что-то, отдаём хвост, логируем usage и завершаем
+                            if buf:
+                                yield "".join(buf)
+                            self.logger.info(f"[INFO] Получено {chunk_count} чанков до ошибки, завершаем")
+                            if collected_usage:
+                                self.logger.info(
+                                    f"[USAGE] prompt={collected_usage.get('prompt_tokens')} "
+                                    f"cached={extract_cached_tokens(collected_usage)} "
+                                    f"output={collected_usage.get('completion_tokens')}")
+                                yield {"usage": collected_usage}  # ← для track_usage_stream
+                            return
+                        # Если ничего не получили, пробуем retry
+                        if retry < self.max_retries - 1:
+                            continue
+
+                    # === КОНЕЦ СТРИМА: ДОСЫЛАЕМ ХВОСТ, ЛОГИРУЕМ USAGE ===
+                    if buf:
+                        yield "".join(buf)
+
+                    if collected_usage:
+                        self.logger.info(
+                            f"[USAGE] Стрим завершён: prompt={collected_usage.get('prompt_tokens')} "
+                            f"cached={extract_cached_tokens(collected_usage)} "
+                            f"output={collected_usage.get('completion_tokens')}")
+                        yield {"usage": collected_usage}  # ← один раз, после цикла; для track_usage_stream
+
+                    self.logger.info(f"[INFO] Стрим успешно завершен, получено {chunk_count} чанков")
+                    self._breaker.record_success()
+                    return  # успешно завершили стрим
+
+            # === СЕТЬ / TLS / ТАЙМАУТЫ — повторяем ===
+            except _RETRYABLE_ERRORS as e:
+                self.logger.warning(
+                    "[RETRY] %s в стриме (попытка %d/%d): %s",
+                    type(e).__name__, retry + 1, self.max_retries, e,
+                    exc_info=self.logger.isEnabledFor(logging.DEBUG),
+                )
                 if retry < self.max_retries - 1:
                     continue
+                self._breaker.record_failure()
                 yield error_msg
                 return
 
-            # === ВСЕ ОСТАЛЬНЫЕ ОШИБКИ ===
-            except Exception as e:
-                self.logger.error(f"[ERROR] Неожиданная ошибка в стриме (попытка {retry + 1}/{self.max_retries}): {type(e).__name__}: {e}")
-                self.logger.debug(f"[DEBUG] Traceback: {traceback.format_exc()}")
-                if retry < self.max_retries - 1:
-                    continue
+            # === ВСЁ ОСТАЛЬНОЕ — без повторов ===
+            except Exception:
+                self.logger.exception("[ERROR] Неожиданная ошибка в _send_request_stream")
                 yield error_msg
                 return
 
         self.logger.error(f"[ERROR] Все {self.max_retries} попытки стрима провалились")
+        self._breaker.record_failure()
         yield "Кажется, у нас что-то не то с API или интернетом..."
 
     def update_config(self, mode: str, **kwargs: Any) -> None:
         """Обновляет конфигурацию для указанного режима."""
-        self.logger.debug(f"[DEBUG] Обновление конфигурации для режима {mode}")
+        self.logger.debug("[DEBUG] Обновление конфигурации для режима %s", mode)
         try:
             if mode not in self.mode_config:
                 self.logger.error(f"[ERROR] Неизвестный режим: {mode}")
                 raise ValueError(f"Неизвестный режим: {mode}")
             self.mode_config[mode].update(kwargs)
+            if mode == self.mode:
+                self._apply_mode_config()
             self.logger.info(f"[DEBUG] Конфигурация для {mode} обновлена: {kwargs}")
         except Exception as e:
             self.logger.error(f"[ERROR] Ошибка при обновлении конфигурации: {e}")
@@ -11,13 +11,14 @@
 # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
 # GNU Affero General Public License for more details.
 
-from logging import Logger
+from logging import DEBUG, Logger
 from typing import Optional, Tuple
 
 def extract_usage_info(logger: Logger, response: dict) -> Optional[Tuple[int, int]]:
     """Хелпер для подсчета токенов"""
     try:
-        logger.info(f"response: {response}")
+        if logger.isEnabledFor(DEBUG):
+            logger.debug("response usage keys: %s", list(response.keys()) if isinstance(response, dict) else type(response))
         usage_data = response.get("usage")
         if not usage_data:
             return None
@@ -30,3 +31,16 @@ def extract_usage_info(logger: Logger, response: dict) -> Optional[Tuple[int, in
     except Exception as e:
         logger.warning(f"[extract_usage_info] Ошибка: {e}")
         return None
+
+
+def extract_cached_tokens(usage_data: Optional[dict]) -> int:
+    """
+    Сколько входных токенов провайдер взял из своего prompt cache.
+
+    OpenAI/xAI: usage.prompt_tokens_details.cached_tokens,
+    DeepSeek: usage.prompt_cache_hit_tokens.
+    """
+    if not usage_data:
+        return 0
+    details = usage_data.get("prompt_tokens_details") or {}
+    return details.get("cached_tokens") or usage_data.get("prompt_cache_hit_tokens") or 0
@@ -0,0 +1,129 @@
+# Victor AI - Personal AI Companion for Android
+# Copyright (C) 2025-2026 Olga Kalinina
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import orjson
+
+from infrastructure.logging.logger import setup_logger
+
+logger = setup_logger("llm_response_cache")
+
+
+def make_cache_key(json_payload: Dict[str, Any]) -> str:
+    """SHA-256 от канонического JSON payload (ключи отсортированы)."""
+    raw = orjson.dumps(json_payload, option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(raw).hexdigest()
+
+
+class ResponseCache:
+    """
+    Двухуровневый кэш ответов LLM.
+
+    L1 — LRU в памяти процесса с TTL, L2 — SQLite-файл, переживающий
+    рестарты. Значение — словарь {"assistant_response", "usage"}.
+    """
+
+    # Раз в столько записей (и при открытии) из L2 удаляются просроченные строки
+    PRUNE_EVERY = 500
+
+    def __init__(self, db_path: Optional[Path] = None, maxsize: int = 512, ttl: float = 7 * 86400):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._sets_since_prune = 0
+        self._memory: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _get_conn(self) -> Optional[sqlite3.Connection]:
+        """Ленивое соединение с L2; при ошибке кэш работает только в памяти."""
+        if self._db_path is None:
+            return None
+        if self._conn is None:
+            try:
+                self._db_path.parent.mkdir(parents=True, exist_ok=True)
+                conn = sqlite3.connect(self._db_path, check_same_thread=False, isolation_level=None)
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS llm_cache("
+                    "key TEXT PRIMARY KEY, "
+                    "value BLOB NOT NULL, "
+                    "expires_at REAL NOT NULL)"
+                )
+                self._prune(conn)
+                self._conn = conn
+            except sqlite3.Error as e:
+                logger.warning("[CACHE] L2 недоступен (%s): %s", self._db_path, e)
+                self._db_path = None
+                return None
+        return self._conn
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    return value
+                del self._memory[key]
+
+            conn = self._get_conn()
+            if conn is None:
+                return None
+            row = conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                return None
+
+            value = orjson.loads(row[0])
+            self._remember(key, row[1], value)
+            return value
+
+    def set(self, key: str, value: dict, ttl: Optional[float] = None) -> None:
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remember(key, expires_at, value)
+            conn = self._get_conn()
+            if conn is not None:
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?)",
+                    (key, orjson.dumps(value), expires_at),
+                )
+                self._sets_since_prune += 1
+                if self._sets_since_prune >= self.PRUNE_EVERY:
+                    self._prune(conn)
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        """Удаляет просроченные строки L2: ключи, которые больше не читают, иначе копятся вечно."""
+        conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+        self._sets_since_prune = 0
+
+    def _remember(self, key: str, expires_at: float, value: dict) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+
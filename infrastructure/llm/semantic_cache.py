@@ -0,0 +1,74 @@
+# Victor AI - Personal AI Companion for Android
+# Copyright (C) 2025-2026 Olga Kalinina
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+
+class SemanticResponseCache:
+    """
+    Кэш ответов LLM по смысловой близости запроса.
+
+    Хранит нормированные эмбеддинги запросов по сегментам, поиск — одно
+    матричное умножение (cosine). Сегмент задаёт вызывающий: в нём всё, что
+    не входит в эмбеддинг, но влияет на ответ (аккаунт, модель, системный
+    промпт, история). Отдельный от точного кэша слой: срабатывает на
+    перефразированные повторы. Число сегментов ограничено (LRU).
+    """
+
+    def __init__(self, threshold: float = 0.9, max_per_segment: int = 1000, max_segments: int = 1024):
+        self.threshold = threshold
+        self.max_per_segment = max_per_segment
+        self.max_segments = max_segments
+        self._vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._values: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def get(self, segment: str, embedding: np.ndarray) -> Optional[dict]:
+        with self._lock:
+            matrix = self._vectors.get(segment)
+            if matrix is None or not len(matrix):
+                return None
+            scores = matrix @ self._normalize(embedding)
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            self._vectors.move_to_end(segment)
+            self._values.move_to_end(segment)
+            return self._values[segment][best]
+
+    def set(self, segment: str, embedding: np.ndarray, value: dict) -> None:
+        vector = self._normalize(embedding)[None, :]
+        with self._lock:
+            matrix = self._vectors.get(segment)
+            values = self._values.setdefault(segment, [])
+            matrix = vector if matrix is None else np.vstack([matrix, vector])
+            values.append(value)
+            if len(values) > self.max_per_segment:
+                matrix = matrix[1:]
+                del values[0]
+            self._vectors[segment] = matrix
+            self._vectors.move_to_end(segment)
+            self._values.move_to_end(segment)
+            if len(self._vectors) > self.max_segments:
+                oldest, _ = self._vectors.popitem(last=False)
+                del self._values[oldest]
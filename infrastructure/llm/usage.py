@@ -11,15 +11,19 @@
 # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
 # GNU Affero General Public License for more details.
 
+import asyncio
 import functools
 import logging
-from typing import Callable, Optional, Awaitable
+from typing import Callable, Dict, List, Optional, Awaitable, Tuple
 
 from infrastructure.database.repositories import ModelUsageRepository
 from infrastructure.database.session import Database
 from infrastructure.llm.helpers import extract_usage_info
+from infrastructure.logging.logger import setup_logger
 from infrastructure.utils.threading_tools import run_in_executor
 
+logger_usage = setup_logger("llm_usage")
+
 
 def update_model_usage(account_id: str, model_name: str, provider: str, input_tokens: int, output_tokens: int):
     """
@@ -39,6 +43,93 @@ def update_model_usage(account_id: str, model_name: str, provider: str, input_to
         repo.update_usage(account_id, model_name, provider, input_tokens, output_tokens)
 
 
+# Фоновая запись usage: события копятся в очереди и пишутся пачками
+_USAGE_BATCH_SIZE = 100
+_USAGE_FLUSH_INTERVAL = 0.5  # сек
+_usage_queue: Optional[asyncio.Queue] = None
+
+UsageEvent = Tuple[str, str, str, int, int]
+
+
+def update_model_usage_batch(events: List[UsageEvent]) -> None:
+    """Суммирует события по (account_id, model_name, provider) и пишет их одной транзакцией."""
+    totals: Dict[Tuple[str, str, str], Tuple[int, int]] = {}
+    for account_id, model_name, provider, input_tokens, output_tokens in events:
+        key = (account_id, model_name, provider)
+        prev_in, prev_out = totals.get(key, (0, 0))
+        totals[key] = (prev_in + input_tokens, prev_out + output_tokens)
+
+    db = Database.get_instance()
+    with db.get_session() as session:
+        ModelUsageRepository(session).add_usage_batch(totals)
+
+
+async def usage_writer_worker() -> None:
+    """
+    Фоновая задача: забирает usage-события из очереди и сохраняет их пачками
+    (до _USAGE_BATCH_SIZE событий или раз в _USAGE_FLUSH_INTERVAL секунд).
+
+    Пока воркер запущен, декораторы track_usage* не ходят в БД сами.
+    При остановке досохраняет всё, что осталось в очереди.
+    """
+    global _usage_queue
+    queue: asyncio.Queue = asyncio.Queue()
+    _usage_queue = queue
+    loop = asyncio.get_running_loop()
+    batch: List[UsageEvent] = []
+    try:
+        while True:
+            batch.append(await queue.get())
+            deadline = loop.time() + _USAGE_FLUSH_INTERVAL
+            while len(batch) < _USAGE_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # Пачку отдаём в executor, а batch сразу обнуляем: если задачу
+            # отменят во время записи, finally не запишет её второй раз
+            submitted, batch = batch, []
+            try:
+                await run_in_executor(update_model_usage_batch, submitted)
+            except Exception as e:
+                logger_usage.warning("[usage] Не удалось сохранить пачку usage: %s", e)
+    finally:
+        _usage_queue = None
+        while not queue.empty():
+            batch.append(queue.get_nowait())
+        if batch:
+            try:
+                update_model_usage_batch(batch)
+            except Exception as e:
+                logger_usage.warning("[usage] Не удалось сохранить остаток usage: %s", e)
+
+
+async def _save_usage(account_id: str, model_name: str, provider: str,
+                      input_tokens: int, output_tokens: int) -> None:
+    """Ставит usage в очередь фонового воркера, а без него пишет в БД сразу."""
+    if _usage_queue is not None:
+        _usage_queue.put_nowait((account_id, model_name, provider, input_tokens, output_tokens))
+        return
+    await run_in_executor(update_model_usage, account_id, model_name, provider, input_tokens, output_tokens)
+
+
+def _resolve_usage_context(args: tuple, logger, account_id, model_name, provider) -> tuple:
+    """
+    Один раз на вызов определяет (logger, account_id, model_name, provider):
+    параметр декоратора, а если он не задан — атрибут self (args[0]).
+    """
+    owner = args[0] if args else None
+    return (
+        logger or getattr(owner, "logger", None),
+        account_id or getattr(owner, "account_id", None),
+        model_name or getattr(owner, "model_name", None),
+        provider or getattr(owner, "provider", None),
+    )
+
+
 def track_usage(
     logger: Optional[logging.Logger] = None,
     account_id: Optional[str] = None,
@@ -88,46 +179,36 @@ def track_usage(
         Notes:
             - Ошибки в декораторе логируются как WARNING, но не прерывают выполнение основной функции.
             - Использует extract_usage_info() для парсинга usage из ответа LLM.
-            - Сохранение в БД происходит синхронно через run_in_executor() с функцией update_model_usage().
+            - Сохранение в БД идёт пачками через очередь usage_writer_worker(); если воркер
+              не запущен — сразу через run_in_executor() с функцией update_model_usage().
         """
     def decorator(func: Callable[..., Awaitable[dict]]):
         @functools.wraps(func)
         async def wrapper(*args, **kwargs):
             response = await func(*args, **kwargs)
 
-            try:
-                # Получаем логгер (из аргументов декоратора или из экземпляра класса)
-                _logger = logger or getattr(args[0], "logger", None)
-
-                _account_id = account_id or getattr(args[0], "account_id", None)
+            # Параметры декоратора или атрибуты экземпляра класса
+            _logger, _account_id, _model_name, _provider = _resolve_usage_context(
+                args, logger, account_id, model_name, provider
+            )
 
+            try:
                 # Извлекаем usage
                 usage = extract_usage_info(_logger, response)
 
                 if _logger:
-                    _logger.info(f"usage: {usage}")
+                    _logger.debug("usage: %s", usage)
 
                 if usage is None:
                     return response
 
                 input_tokens, output_tokens = usage
 
-                # Получаем модель и провайдера
-                _model_name = model_name or getattr(args[0], "model_name", None)
-                _provider = provider or getattr(args[0], "provider", None)
-
                 if not _model_name or not _provider:
                     raise ValueError("track_usage: Не удалось определить model_name или provider.")
 
-                # Отправим usage в базу
-                await run_in_executor(
-                    update_model_usage,
-                    _account_id,
-                    _model_name,
-                    _provider,
-                    input_tokens,
-                    output_tokens
-                )
+                # Отправим usage в базу (через очередь фонового воркера)
+                await _save_usage(_account_id, _model_name, _provider, input_tokens, output_tokens)
 
             except Exception as e:
                 if _logger:
@@ -147,53 +228,45 @@ def track_usage_stream(
     def decorator(func):
         @functools.wraps(func)
         async def wrapper(*args, **kwargs):
-            _logger = logger or getattr(args[0], "logger", None)
-            _account_id = account_id or getattr(args[0], "account_id", None)
-            _model_name = model_name or getattr(args[0], "model_name", None)
-            _provider = provider or getattr(args[0], "provider", None)
+            _logger, _account_id, _model_name, _provider = _resolve_usage_context(
+                args, logger, account_id, model_name, provider
+            )
 
             usage_data = None
 
-            async for chunk in func(*args, **kwargs):
-                # === ВАРИАНТ 1: OpenAI-формат (chunk — dict) ===
-                if isinstance(chunk, dict):
-                    # Ловим usage в последнем chunk
-                    if "usage" in chunk:
-                        usage_data = chunk["usage"]
-                    # Или в choices[0].usage (зависит от провайдера)
-                    elif (
-                        "choices" in chunk
-                        and chunk["choices"]
-                        and "usage" in chunk["choices"][0]
-                    ):
-                        usage_data = chunk["choices"][0]["usage"]
-
-                # === ВАРИАНТ 2: Твой кастомный формат: {"usage": {...}} ===
-                elif isinstance(chunk, dict) and "usage" in chunk:
-                    usage_data = chunk["usage"]
-
-                # Пробрасываем chunk дальше
-                yield chunk
-
-            # === После стрима — сохраняем ===
-            if usage_data and _logger:
-                input_tokens = usage_data.get("prompt_tokens") or usage_data.get("input_tokens", 0)
-                output_tokens = usage_data.get("completion_tokens") or usage_data.get("output_tokens", 0)
-
-                _logger.info(
-                    f"[USAGE] account={_account_id} model={_model_name} "
-                    f"provider={_provider} input={input_tokens} output={output_tokens}"
-                )
-
-                if _account_id and _model_name:
-                    await run_in_executor(
-                        update_model_usage,
-                        _account_id,
-                        _model_name,
-                        _provider,
-                        input_tokens,
-                        output_tokens,
+            try:
+                async for chunk in func(*args, **kwargs):
+                    # Текстовые дельты (str) пропускаем без разбора; usage приходит
+                    # dict'ом: {"usage": {...}} или в choices[0].usage (зависит от провайдера)
+                    if type(chunk) is dict:
+                        u = chunk.get("usage")
+                        if u is None:
+                            choices = chunk.get("choices")
+                            if choices:
+                                u = choices[0].get("usage")
+                        if u is not None:
+                            usage_data = u
+                            if len(chunk) == 1:
+                                continue  # служебный кадр {"usage": ...} потребителю не отдаём
+
+                    # Пробрасываем chunk дальше
+                    yield chunk
+            finally:
+                # === После стрима — сохраняем usage, если провайдер его прислал ===
+                # Кадр {"usage": ...} приходит только в конце (или после обрыва
+                # с частью текста). Если потребитель отменил стрим раньше,
+                # usage неизвестен и ничего не записывается.
+                if usage_data and _logger:
+                    input_tokens = usage_data.get("prompt_tokens") or usage_data.get("input_tokens", 0)
+                    output_tokens = usage_data.get("completion_tokens") or usage_data.get("output_tokens", 0)
+
+                    _logger.info(
+                        f"[USAGE] account={_account_id} model={_model_name} "
+                        f"provider={_provider} input={input_tokens} output={output_tokens}"
                     )
 
+                    if _account_id and _model_name:
+                        await _save_usage(_account_id, _model_name, _provider, input_tokens, output_tokens)
+
         return wrapper
     return decorator
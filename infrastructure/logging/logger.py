@@ -11,8 +11,11 @@
 # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
 # GNU Affero General Public License for more details.
 
+import atexit
 import logging
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
 
 
@@ -23,6 +26,40 @@ AUTONOMY_LOG_FILE = LOG_DIR / "autonomy.log"
 
 _LOG_FORMAT = "[%(asctime)s] [%(name)s] [%(levelname)s] %(message)s"
 _LOG_DATEFMT = "%Y-%m-%d %H:%M:%S"
+_LOG_MAX_BYTES = 10 * 1024 * 1024  # ротация файлов до 10 МБ
+_LOG_BACKUP_COUNT = 5
+
+# Один QueueHandler на файл лога: запись на диск и в консоль делает фоновый
+# QueueListener, а не поток, в котором логируют (в т.ч. event loop).
+_queue_handlers: dict[Path, QueueHandler] = {}
+
+
+def _get_queue_handler(log_file: Path, handler_level: int = logging.NOTSET) -> QueueHandler:
+    """Возвращает общий QueueHandler для файла, запуская listener при первом вызове."""
+    handler = _queue_handlers.get(log_file)
+    if handler is not None:
+        return handler
+
+    formatter = logging.Formatter(_LOG_FORMAT, datefmt=_LOG_DATEFMT)
+
+    file_handler = RotatingFileHandler(
+        log_file, maxBytes=_LOG_MAX_BYTES, backupCount=_LOG_BACKUP_COUNT, encoding="utf-8"
+    )
+    file_handler.setLevel(handler_level)
+    file_handler.setFormatter(formatter)
+
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setLevel(handler_level)
+    console_handler.setFormatter(formatter)
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+
+    handler = QueueHandler(log_queue)
+    _queue_handlers[log_file] = handler
+    return handler
 
 
 def setup_logger(name: str) -> logging.Logger:
@@ -33,15 +70,7 @@ def setup_logger(name: str) -> logging.Logger:
         return logger
 
     logger.setLevel(logging.INFO)
-
-    file_handler = logging.FileHandler(LOG_FILE, encoding="utf-8")
-    file_handler.setFormatter(logging.Formatter(_LOG_FORMAT, datefmt=_LOG_DATEFMT))
-
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setFormatter(logging.Formatter(_LOG_FORMAT, datefmt=_LOG_DATEFMT))
-
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    logger.addHandler(_get_queue_handler(LOG_FILE))
 
     return logger
 
@@ -60,17 +89,7 @@ def setup_autonomy_logger(name: str) -> logging.Logger:
         return logger
 
     logger.setLevel(logging.DEBUG)
-
-    file_handler = logging.FileHandler(AUTONOMY_LOG_FILE, encoding="utf-8")
-    file_handler.setLevel(logging.INFO)
-    file_handler.setFormatter(logging.Formatter(_LOG_FORMAT, datefmt=_LOG_DATEFMT))
-
-    console_handler = logging.StreamHandler(sys.stdout)
-    console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(logging.Formatter(_LOG_FORMAT, datefmt=_LOG_DATEFMT))
-
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    logger.addHandler(_get_queue_handler(AUTONOMY_LOG_FILE, handler_level=logging.INFO))
 
     logger.propagate = False
 
@@ -11,21 +11,43 @@
 # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
 # GNU Affero General Public License for more details.
 
-import requests
+import asyncio
+from typing import NamedTuple, Optional
+
+import orjson
+
+import aiohttp
 
 from infrastructure.logging.logger import setup_logger
 from settings import settings
 logger = setup_logger("send_reminders")
 
+PUSHY_PUSH_URL = "https://api.pushy.me/push"
+# Pushy принимает до 1000 получателей в одном запросе
+PUSHY_MAX_RECIPIENTS = 1000
+# Не больше стольких одновременных запросов к api.pushy.me,
+# между волнами отправки — короткая пауза
+PUSHY_MAX_CONCURRENCY = 20
+_PUSHY_WAVE_PAUSE = 0.1  # сек
+
+# Общий пул соединений к Pushy для async-отправок (keep-alive между пушами)
+_pushy_session: Optional[aiohttp.ClientSession] = None
+_pushy_session_loop: Optional[asyncio.AbstractEventLoop] = None
+_PUSHY_TIMEOUT = aiohttp.ClientTimeout(total=10)
+# Тело сериализуем сами через orjson и шлём как data=
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
 
-def send_pushy_notification(token: str, title: str, body: str, data: dict):
-    """Отправка уведомлений на андроид с помощью сервиса pushi"""
-    url = "https://api.pushy.me/push?api_key=" + settings.PUSHY_SECRET_KEY
+class PushMessage(NamedTuple):
+    token: str
+    title: str
+    body: str
+    data: dict
 
 
-    logger.info(f"[DEBUG] Отправляю через Pushy API token={token[:12]}...")
-    payload = {
-        "to": token,  # Device token от Android
+def _build_payload(to: str | list[str], title: str, body: str, data: dict) -> dict:
+    return {
+        "to": to,  # Device token (или список токенов) от Android
         "notification": {
             "title": title,
             "body": body
@@ -33,5 +55,80 @@ def send_pushy_notification(token: str, title: str, body: str, data: dict):
         "data": data  # Дополнительные данные
     }
 
-    response = requests.post(url, json=payload)
-    return response.json()
\ No newline at end of file
+
+async def _get_pushy_session() -> aiohttp.ClientSession:
+    global _pushy_session, _pushy_session_loop
+    loop = asyncio.get_running_loop()
+    if _pushy_session is None or _pushy_session.closed or _pushy_session_loop is not loop:
+        connector = aiohttp.TCPConnector(limit=100, limit_per_host=PUSHY_MAX_CONCURRENCY, keepalive_timeout=75)
+        _pushy_session = aiohttp.ClientSession(connector=connector, timeout=_PUSHY_TIMEOUT)
+        _pushy_session_loop = loop
+    return _pushy_session
+
+
+async def send_pushy_notification_async(to: str | list[str], title: str, body: str, data: dict):
+    """
+    Отправка пуша на андроид через сервис Pushy из event loop.
+
+    Не блокирует loop на время HTTP-запроса и переиспользует
+    keep-alive соединение с Pushy. to — токен или список токенов
+    (не больше PUSHY_MAX_RECIPIENTS), так её использует send_pushy_batch.
+    """
+    session = await _get_pushy_session()
+    async with session.post(
+        PUSHY_PUSH_URL,
+        params={"api_key": settings.PUSHY_SECRET_KEY},
+        data=orjson.dumps(_build_payload(to, title, body, data)),
+        headers=_JSON_HEADERS,
+    ) as response:
+        return await response.json(content_type=None)
+
+
+async def close_pushy_session() -> None:
+    """Закрывает общий пул соединений к Pushy (при shutdown приложения)."""
+    global _pushy_session, _pushy_session_loop
+    if _pushy_session is not None and not _pushy_session.closed:
+        await _pushy_session.close()
+    _pushy_session = None
+    _pushy_session_loop = None
+
+
+async def send_pushy_batch(messages: list[PushMessage]) -> list:
+    """
+    Отправляет пачку пушей минимальным числом запросов к Pushy.
+
+    Сообщения с одинаковыми title/body/data объединяются в один запрос
+    с массивом получателей в "to" (до PUSHY_MAX_RECIPIENTS токенов),
+    разные группы уходят волнами по PUSHY_MAX_CONCURRENCY запросов
+    с короткой паузой между волнами, чтобы не устраивать стампид на Pushy.
+    Возвращает ответы Pushy (или исключения) по каждому запросу.
+    """
+    groups: dict[tuple, tuple[PushMessage, list[str]]] = {}
+    for msg in messages:
+        key = (msg.title, msg.body, orjson.dumps(msg.data, option=orjson.OPT_SORT_KEYS))
+        if key in groups:
+            groups[key][1].append(msg.token)
+        else:
+            groups[key] = (msg, [msg.token])
+
+    if not groups:
+        return []
+
+    posts = [
+        send_pushy_notification_async(tokens[i:i + PUSHY_MAX_RECIPIENTS], msg.title, msg.body, msg.data)
+        for msg, tokens in groups.values()
+        for i in range(0, len(tokens), PUSHY_MAX_RECIPIENTS)
+    ]
+    logger.info("[pushy] Пачка: %d сообщений → %d запросов", len(messages), len(posts))
+
+    results = []
+    for i in range(0, len(posts), PUSHY_MAX_CONCURRENCY):
+        if i:
+            await asyncio.sleep(_PUSHY_WAVE_PAUSE)
+        results.extend(await asyncio.gather(
+            *posts[i:i + PUSHY_MAX_CONCURRENCY], return_exceptions=True
+        ))
+    for result in results:
+        if isinstance(result, BaseException):
+            logger.warning("[pushy] Ошибка отправки пачки: %s", result)
+    return results
@@ -13,42 +13,141 @@
 
 import asyncio
 from datetime import datetime, timedelta
-from sqlalchemy import select, and_
+from sqlalchemy import DateTime, Integer, and_, bindparam, cast, func, literal, select, tuple_, update
+from sqlalchemy.dialects.postgresql import JSONB
 from infrastructure.database.models import UserAlarms, Reminder
 from infrastructure.database.session import Database
-from infrastructure.firebase.tokens import get_user_tokens
+from infrastructure.firebase.tokens import get_tokens_for_accounts
 from infrastructure.logging.logger import setup_logger
-from infrastructure.pushi.push_notifications import send_pushy_notification
+from infrastructure.pushi.push_notifications import PushMessage, send_pushy_batch
+from infrastructure.pushi.reminders_wakeup import bind_wakeup_event
+from infrastructure.utils.threading_tools import run_in_executor
 
 logger = setup_logger("reminders_sender")
 
+# Сколько просроченных напоминаний выбираем за один запрос
+DUE_REMINDERS_BATCH = 500
 
-def check_and_send_reminders_pushi():
+# UPDATE по первичному ключу для executemany. Явный WHERE с bindparam:
+# session.execute(update(Reminder), [...]) как bulk-update по PK есть
+# только в SQLAlchemy 2.0, а в 1.4 он обновляет все строки без WHERE
+_MARK_REMINDER_SENT = (
+    update(Reminder)
+    .where(Reminder.id == bindparam("b_id"))
+    .values(datetime=bindparam("b_datetime"), done=bindparam("b_done"))
+    .execution_options(synchronize_session=False)
+)
+
+# Режимы повтора будильника, ограниченные частью недели
+_WEEKDAY_ONLY = frozenset({"Будни"})      # только пн–пт
+_WEEKEND_ONLY = frozenset({"Выходные"})   # только сб–вс
+
+# Минута, за которую будильники уже обработаны: планировщик может
+# проснуться несколько раз за минуту, а будильник должен сработать один раз
+_last_alarm_minute: datetime | None = None
+
+
+async def run_reminders_scheduler():
+    """
+    Планировщик напоминаний и будильников вместо опроса раз в минуту.
+
+    Просыпается в ближайший из моментов: срок следующего напоминания,
+    начало следующей минуты (будильники заданы с точностью до минуты)
+    или сигнал notify_reminders_changed() при создании/изменении напоминания.
+    """
+    wakeup = bind_wakeup_event()
+    while True:
+        wakeup.clear()
+        try:
+            await check_and_send_reminders_pushi()
+            next_due = await run_in_executor(_next_due_reminder_at)
+        except Exception:
+            logger.exception("[reminders] Ошибка в планировщике напоминаний")
+            next_due = None
+
+        now = datetime.now()
+        timeout = 60 - now.second - now.microsecond / 1_000_000  # до начала следующей минуты
+        if next_due is not None:
+            until_due = (next_due - _normalize_now_for_dt(now, next_due)).total_seconds()
+            # Просроченные, но не отправленные (нет токенов) не должны крутить цикл
+            if 0 < until_due < timeout:
+                timeout = until_due
+
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=max(timeout, 0.1))
+        except asyncio.TimeoutError:
+            pass
+
+
+def _next_due_reminder_at() -> datetime | None:
+    """
+    Время ближайшего будущего невыполненного напоминания (по индексу idx_reminders_due).
+
+    Просроченные сюда не попадают: их подбирает поминутный проход, а одно
+    зависшее (например, без токенов) иначе держало бы «ближайший срок» в прошлом
+    и отключало точное пробуждение.
+    """
+    now = datetime.now().astimezone()  # Reminder.datetime — timestamptz
+    session = Database.get_instance().get_session()
+    try:
+        return session.scalar(
+            select(func.min(Reminder.datetime))
+            .where(Reminder.done.is_(False), Reminder.datetime > now)
+        )
+    finally:
+        session.close()
+
+
+async def check_and_send_reminders_pushi():
     """
     Проверяет напоминалки и будильники.
+
+    Работа с БД идёт в executor'е и только собирает пуши; сами пуши
+    уходят одной асинхронной пачкой через общий пул соединений Pushy.
+    """
+    outbox = await run_in_executor(_collect_due_pushes)
+    if not outbox:
+        return
+
+    results = await send_pushy_batch(outbox)
+    failed = sum(1 for result in results if isinstance(result, BaseException))
+    logger.info("[reminders] Пуши отправлены: %d шт., запросов: %d, ошибок: %d", len(outbox), len(results), failed)
+
+
+def _collect_due_pushes() -> list[PushMessage]:
+    """
+    Обновляет напоминалки/будильники в БД и возвращает пуши к отправке.
     Использует singleton Database для избежания утечки соединений.
     """
+    global _last_alarm_minute
     now = datetime.now()
     db = Database.get_instance()
     session = db.get_session()
+    outbox: list[PushMessage] = []
 
     try:
         fixed_weekly = reset_done_weekly_reminders(session, now)
-        processed_reminders = process_due_reminders(session, now)
-        processed_alarms = process_alarms(session, now)
+        processed_reminders = process_due_reminders(session, now, outbox)
+
+        processed_alarms = 0
+        alarm_minute = now.replace(second=0, microsecond=0)
+        if alarm_minute != _last_alarm_minute:
+            processed_alarms = process_alarms(session, now, outbox)
+            _last_alarm_minute = alarm_minute
 
         logger.debug(
-            f"check_and_send_reminders_pushi: завершено. "
-            f"Напоминаний: {processed_reminders}, "
-            f"weekly-rescheduled: {fixed_weekly}, "
-            f"будильников: {processed_alarms}"
+            "check_and_send_reminders_pushi: завершено. "
+            "Напоминаний: %d, weekly-rescheduled: %d, будильников: %d",
+            processed_reminders, fixed_weekly, processed_alarms,
         )
 
     except Exception as e:
-        logger.error(f"❌ Критическая ошибка в чекере будильников/напоминаний: {e}", exc_info=True)
+        logger.error("❌ Критическая ошибка в чекере будильников/напоминаний: %s", e, exc_info=True)
     finally:
         session.close()
 
+    return outbox
+
 
 def _normalize_now_for_dt(now: datetime, dt: datetime) -> datetime:
     """
@@ -88,192 +187,201 @@ def reset_done_weekly_reminders(session, now: datetime) -> int:
     """
     Safety-net: weekly-напоминания не должны оставаться done=True.
     Если нашли такие — переносим их на ближайшую будущую неделю и делаем done=False.
+
+    Один UPDATE на стороне Postgres: datetime сдвигается на минимальное
+    число недель k >= 1, при котором оно становится строго позже now
+    (та же логика, что в _next_weekly_datetime).
     """
-    reminders = session.scalars(
-        select(Reminder).where(
+    # Reminder.datetime — timestamptz: naive now Postgres прочитал бы в
+    # таймзоне сессии, а не в локальной таймзоне приложения
+    if now.tzinfo is None:
+        now = now.astimezone()
+    elapsed_weeks = func.floor(
+        func.extract("epoch", literal(now, DateTime(timezone=True)) - Reminder.datetime) / 604800
+    )
+    weeks_to_add = cast(func.greatest(elapsed_weeks + 1, 1), Integer)
+
+    result = session.execute(
+        update(Reminder)
+        .where(
             and_(
                 Reminder.repeat_weekly.is_(True),
                 Reminder.done.is_(True),
             )
         )
-    ).all()
+        .values(
+            datetime=Reminder.datetime + func.make_interval(0, 0, weeks_to_add),
+            done=False,
+        )
+        .execution_options(synchronize_session=False)
+    )
 
-    if not reminders:
+    processed = result.rowcount
+    if not processed:
+        session.rollback()
         return 0
 
-    processed = 0
-    for r in reminders:
-        r.datetime = _next_weekly_datetime(r.datetime, now)
-        r.done = False
-        session.add(r)
-        processed += 1
-
     session.commit()
-    logger.info(f"[reminders] weekly: восстановили (done->active) и перенесли: {processed} шт.")
+    logger.info("[reminders] weekly: восстановили (done->active) и перенесли: %d шт.", processed)
     return processed
 
-def process_due_reminders(session, now: datetime) -> int:
+def process_due_reminders(session, now: datetime, outbox: list[PushMessage]) -> int:
     """
-    Находит и отправляет все просроченные/текущие напоминания.
+    Находит все просроченные/текущие напоминания и складывает их пуши в outbox.
     Возвращает количество обработанных напоминаний.
-    """
-    reminders = session.scalars(
-        select(Reminder).where(
-            and_(
-                Reminder.done.is_(False),
-                Reminder.datetime <= now
-            )
-        )
-    ).all()
-
-    logger.debug(f"Найдено активных напоминаний для срабатывания: {len(reminders)}")
 
-    processed = 0
-
-    for r in reminders:
-        account_id = r.account_id
-        tokens = get_user_tokens(account_id)
-
-        if not tokens:
-            logger.debug(f"Нет токенов у {account_id}, пропускаем напоминалку id={r.id}")
-            continue
-
-        logger.info(f" СРАБОТАЛО напоминание! → {account_id} | {r.title}")
-
-        _send_reminder_pushes(r, tokens)
-
-        # Для weekly-напоминаний: не "done", а перенос на следующую неделю
-        if r.repeat_weekly:
-            r.datetime = _next_weekly_datetime(r.datetime, now)
-            r.done = False
-        else:
-            # Обычные: помечаем как выполненное
-            r.done = True
-        session.add(r)
-        processed += 1
-
-    if processed:
-        session.commit()
-        logger.info(f"[reminders] Отметили выполненными: {processed} шт.")
-
-    return processed
-
-
-def _send_reminder_pushes(r: Reminder, tokens: list[str]) -> None:
-    """Отправляет пуши по одному напоминанию всем токенам."""
-    for token in tokens:
-        try:
-            send_pushy_notification(
-                token=token,
-                title=r.title or "Напоминание",
-                body=r.text or "Пора действовать~",
-                data={
-                    "reminder_id": str(r.id),
-                    "account_id": r.account_id,
-                    "title": "Напоминалка ♡",
-                    "text": r.text or "",
-                    "repeat_weekly": r.repeat_weekly,
-                },
-            )
-            logger.info(f" Отправлено напоминание → {token[:12]}…")
-        except Exception as e:
-            logger.error(f"Ошибка отправки напоминания {r.account_id}: {e}")
+    Читает пачками по DUE_REMINDERS_BATCH в порядке (datetime, id) —
+    по частичному индексу idx_reminders_due — и коммитит каждую пачку.
+    """
+    total = 0
+    last_key = None
+
+    while True:
+        conditions = [Reminder.done.is_(False), Reminder.datetime <= now]
+        if last_key is not None:
+            # Keyset-пагинация: пропущенные (без токенов) строки не выбираются повторно
+            conditions.append(tuple_(Reminder.datetime, Reminder.id) > last_key)
+        reminders = session.scalars(
+            select(Reminder)
+            .where(and_(*conditions))
+            .order_by(Reminder.datetime, Reminder.id)
+            .limit(DUE_REMINDERS_BATCH)
+        ).all()
+        if not reminders:
+            break
+
+        logger.debug("Найдено активных напоминаний для срабатывания: %d", len(reminders))
+        last_key = (reminders[-1].datetime, reminders[-1].id)
+
+        updates: list[dict] = []
+        pushes: list[PushMessage] = []
+        # Токены всех затронутых пользователей — одним запросом, а не на каждое напоминание
+        tokens_by_account = get_tokens_for_accounts(r.account_id for r in reminders)
+
+        for r in reminders:
+            account_id = r.account_id
+            tokens = tokens_by_account.get(account_id, ())
+
+            if not tokens:
+                logger.debug("Нет токенов у %s, пропускаем напоминалку id=%s", account_id, r.id)
+                continue
 
-def process_alarms(session, now: datetime) -> int:
+            logger.info(" СРАБОТАЛО напоминание! → %s | %s", account_id, r.title)
+
+            pushes.extend(_reminder_push_messages(r, tokens))
+
+            # Для weekly-напоминаний: не "done", а перенос на следующую неделю
+            if r.repeat_weekly:
+                updates.append({"b_id": r.id, "b_datetime": _next_weekly_datetime(r.datetime, now), "b_done": False})
+            else:
+                # Обычные: помечаем как выполненное
+                updates.append({"b_id": r.id, "b_datetime": r.datetime, "b_done": True})
+
+        if updates:
+            # Один executemany UPDATE по первичному ключу вместо flush'а по строке
+            session.execute(_MARK_REMINDER_SENT, updates)
+            session.commit()
+            logger.info("[reminders] Отметили выполненными: %d шт.", len(updates))
+            # Пуши уходят только после коммита: иначе при ошибке записи
+            # напоминание осталось бы активным и отправлялось каждый тик
+            outbox.extend(pushes)
+        total += len(updates)
+
+        if len(reminders) < DUE_REMINDERS_BATCH:
+            break
+
+    return total
+
+
+def _reminder_push_messages(r: Reminder, tokens: list[str]) -> list[PushMessage]:
+    """Пуши по одному напоминанию на все токены пользователя."""
+    title = r.title or "Напоминание"
+    body = r.text or "Пора действовать~"
+    data = {
+        "reminder_id": str(r.id),
+        "account_id": r.account_id,
+        "title": "Напоминалка ♡",
+        "text": r.text or "",
+        "repeat_weekly": r.repeat_weekly,
+    }
+    return [PushMessage(token, title, body, data) for token in tokens]
+
+def process_alarms(session, now: datetime, outbox: list[PushMessage]) -> int:
     """
-    Проверяет и отправляет будильники на текущее время.
+    Проверяет будильники на текущее время и складывает их пуши в outbox.
     Возвращает количество сработавших будильников (по всем пользователям).
     """
-    current_time = now.strftime("%H:%M")  # например "06:00"
+    current_time = f"{now.hour:02d}:{now.minute:02d}"  # например "06:00", без strftime
     weekday_today = now.weekday()  # 0=понедельник ... 6=воскресенье
-
-    logger.debug(
-        f"Проверяем будильники для времени: {current_time}, день недели: {weekday_today}"
+    skipped_modes = _modes_skipped_on(weekday_today)
+
+    # Только пользователи, у которых есть будильник на эту минуту
+    # (jsonb @>, индекс ix_user_alarms_alarms_gin); enabled и день недели — ниже.
+    # Только читаем: берём голые кортежи колонок, без ORM-объектов и identity map
+    rows = session.execute(
+        select(UserAlarms.account_id, UserAlarms.selected_track_id, UserAlarms.alarms)
+        .where(cast(UserAlarms.alarms, JSONB).contains([{"time": current_time}]))
+        .execution_options(yield_per=500)
     )
 
-    users = session.query(UserAlarms).all()
-    logger.debug(f"Найдено пользователей с будильниками: {len(users)}")
+    triggered: list[tuple[str, int | None, str]] = []
+    matched_users = 0
 
-    processed = 0
-
-    for user in users:
-        account_id = user.account_id
-        selected_track_id = user.selected_track_id
-        logger.debug(
-            f"Проверяем будильники для {account_id}, кол-во: {len(user.alarms)}"
-        )
-
-        for alarm in user.alarms:
-            if not alarm.get("enabled", True):
-                logger.debug(f"  Будильник отключен: {alarm}")
+    for account_id, selected_track_id, alarms in rows:
+        matched_users += 1
+        for alarm in alarms:
+            # Самый отсекающий фильтр — время — первым
+            if alarm.get("time") != current_time:
                 continue
-
-            alarm_time = alarm.get("time")
-            logger.debug(
-                f"  Будильник: time={alarm_time}, текущее время: {current_time}"
-            )
-
-            if alarm_time != current_time:
+            if not alarm.get("enabled", True):
                 continue
-
-            repeat_mode = alarm.get("repeatMode")
-            logger.debug(
-                f"  Время совпало! repeat_mode={repeat_mode}, weekday={weekday_today}"
-            )
-
-            if not _should_trigger_alarm_today(repeat_mode, weekday_today):
+            if alarm.get("repeatMode") in skipped_modes:
                 continue
 
-            _trigger_alarm_for_user(
-                account_id=account_id,
-                selected_track_id=selected_track_id,
-                alarm_time=alarm_time,
-            )
-            processed += 1
+            triggered.append((account_id, selected_track_id, current_time))
 
-    return processed
+    logger.debug("Найдено пользователей с будильником на %s: %d (день недели %d)",
+                 current_time, matched_users, weekday_today)
 
+    if not triggered:
+        return 0
 
-def _should_trigger_alarm_today(repeat_mode: str | None, weekday_today: int) -> bool:
-    """Решает, должен ли будильник с данным режимом сработать сегодня."""
-    # "Будни" — только пн–пт
-    if repeat_mode == "Будни" and weekday_today >= 5:  # суббота-воскресенье
-        logger.debug("  Пропускаем: будни, а сегодня выходной")
-        return False
+    # Токены только сработавших пользователей — одним запросом
+    tokens_by_account = get_tokens_for_accounts(account_id for account_id, _, _ in triggered)
+    for account_id, selected_track_id, alarm_time in triggered:
+        _trigger_alarm_for_user(
+            account_id=account_id,
+            selected_track_id=selected_track_id,
+            alarm_time=alarm_time,
+            tokens=tokens_by_account.get(account_id, []),
+            outbox=outbox,
+        )
 
-    # "Выходные" — только сб–вс
-    if repeat_mode == "Выходные" and weekday_today < 5:  # понедельник-пятница
-        logger.debug("  Пропускаем: выходные, а сегодня будний день")
-        return False
+    return len(triggered)
 
-    # "Один раз", "Каждый день", None — срабатывают всегда
-    return True
 
+def _modes_skipped_on(weekday_today: int) -> frozenset:
+    """
+    Режимы повтора, которые сегодня не срабатывают.
+    "Один раз", "Каждый день", None — срабатывают всегда.
+    """
+    # суббота-воскресенье → молчат "Будни"; понедельник-пятница → молчат "Выходные"
+    return _WEEKDAY_ONLY if weekday_today >= 5 else _WEEKEND_ONLY
 
-def _trigger_alarm_for_user(account_id: str, selected_track_id: int | None, alarm_time: str) -> None:
-    """Отправляет пуши будильника конкретному пользователю."""
-    logger.info(f"🔔🔔🔔 БУДИЛЬНИК СРАБОТАЛ ДЛЯ {account_id}! Время: {alarm_time}")
 
+def _trigger_alarm_for_user(account_id: str, selected_track_id: int | None, alarm_time: str,
+                            tokens: list[str], outbox: list[PushMessage]) -> None:
+    """Готовит пуши будильника конкретному пользователю."""
     track_id_to_play = selected_track_id or 1  # дефолтный трек
-    logger.info(f"  Трек для воспроизведения: {track_id_to_play}")
-
-    tokens = get_user_tokens(account_id)
-    logger.info(f"  Токены пользователя: {tokens}")
+    logger.info(
+        "🔔🔔🔔 БУДИЛЬНИК СРАБОТАЛ ДЛЯ %s! Время: %s, трек: %s, устройств: %d",
+        account_id, alarm_time, track_id_to_play, len(tokens),
+    )
 
-    for token in tokens:
-        try:
-            msg_id = send_pushy_notification(
-                token=token,
-                title="Доброе утро ♡",
-                body="Включил тебе музыку~",
-                data={
-                    "track_id": str(track_id_to_play),
-                    "alarm_time": alarm_time,
-                },
-            )
-            logger.info(
-                f"✅ Будильник отправлен {account_id} → track {track_id_to_play} → "
-                f"{token[:12]}… msg_id={msg_id}"
-            )
-        except Exception as e:
-            logger.error(f"❌ Ошибка отправки будильника {account_id}: {e}", exc_info=True)
+    data = {
+        "track_id": str(track_id_to_play),
+        "alarm_time": alarm_time,
+    }
+    outbox.extend(
+        PushMessage(token, "Доброе утро ♡", "Включил тебе музыку~", data) for token in tokens
+    )
@@ -0,0 +1,46 @@
+# Victor AI - Personal AI Companion for Android
+# Copyright (C) 2025-2026 Olga Kalinina
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published
+# by the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+# GNU Affero General Public License for more details.
+
+"""Сигнал «напоминания изменились» для планировщика напоминаний."""
+
+import asyncio
+from typing import Optional
+
+_event: Optional[asyncio.Event] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def bind_wakeup_event() -> asyncio.Event:
+    """Создаёт событие в текущем event loop (вызывает планировщик при старте)."""
+    global _event, _loop
+    _loop = asyncio.get_running_loop()
+    _event = asyncio.Event()
+    return _event
+
+
+def notify_reminders_changed() -> None:
+    """
+    Будит планировщик, чтобы он пересчитал ближайшее напоминание.
+
+    Можно вызывать из любого потока; без запущенного планировщика — no-op.
+    """
+    if _event is None or _loop is None or _loop.is_closed():
+        return
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is _loop:
+        _event.set()
+    else:
+        _loop.call_soon_threadsafe(_event.set)
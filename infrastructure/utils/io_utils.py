@@ -11,15 +11,39 @@
 # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
 # GNU Affero General Public License for more details.
 
+import copy
+import os
+import threading
 from logging import Logger
 from pathlib import Path
 
 import yaml
 
+try:
+    from yaml import CSafeLoader as _SafeLoader  # libyaml, в разы быстрее
+except ImportError:  # PyYAML собран без libyaml
+    from yaml import SafeLoader as _SafeLoader
+
+# Разобранные YAML по пути; перечитываются только при изменении файла
+_yaml_cache: dict[Path, tuple[int, dict]] = {}
+_yaml_cache_lock = threading.Lock()
+
+
 def yaml_safe_load(yaml_path: Path, logger: Logger) -> dict:
     try:
-        with open(yaml_path, "r", encoding="utf-8") as f:
-            return yaml.safe_load(f) or {}
+        path = Path(yaml_path).resolve()
+        mtime_ns = os.stat(path).st_mtime_ns
+        with _yaml_cache_lock:
+            cached = _yaml_cache.get(path)
+        if cached is not None and cached[0] == mtime_ns:
+            return copy.deepcopy(cached[1])
+
+        with open(path, "r", encoding="utf-8") as f:
+            data = yaml.load(f, Loader=_SafeLoader) or {}
+        with _yaml_cache_lock:
+            _yaml_cache[path] = (mtime_ns, data)
+        # Копия: вызывающий код может менять результат, кэш — нет
+        return copy.deepcopy(data)
     except Exception as e:
         logger.error(f"Ошибка загрузки {yaml_path}: {e}")
         return {}
@@ -12,13 +12,18 @@
 # GNU Affero General Public License for more details.
 
 import asyncio
+import functools
 from concurrent.futures import ThreadPoolExecutor
 from typing import Callable, Any
 
-# Глобальный executor
-default_executor = ThreadPoolExecutor(max_workers=5)
+from settings import settings
 
-async def run_in_executor(func: Callable, *args, executor: ThreadPoolExecutor = default_executor, **kwargs) -> Any:
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(executor, lambda: func(*args, **kwargs))
+# Глобальный executor для блокирующего I/O (БД, файлы, HTTP через requests)
+default_executor = ThreadPoolExecutor(
+    max_workers=settings.EXECUTOR_WORKERS,
+    thread_name_prefix="victor-io",
+)
 
+async def run_in_executor(func: Callable, *args, executor: ThreadPoolExecutor = default_executor, **kwargs) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
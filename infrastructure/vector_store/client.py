@@ -12,8 +12,10 @@
 # GNU Affero General Public License for more details.
 
 import os
+from functools import lru_cache
+from typing import Optional
+
 import chromadb
-from chromadb import Settings
 from chromadb.api import Collection
 
 from infrastructure.logging.logger import setup_logger
@@ -22,38 +24,52 @@ from settings import settings
 # Инициализация логгера
 logger = setup_logger("chroma_client")
 
+# Кэш коллекций по (id клиента, имя): get_or_create_collection ходит в sysdb.
+# Клиент хранится рядом, чтобы его id не переиспользовался другим объектом.
+_collections: dict[tuple[int, str], tuple[chromadb.ClientAPI, Collection]] = {}
+
+
+@lru_cache(maxsize=1)
 def get_chroma_client() -> chromadb.ClientAPI:
+    """Один PersistentClient на процесс: открывать sqlite и индексы на каждый вызов дорого."""
     os.makedirs(settings.VECTOR_STORE_DIR, exist_ok=True)  # создаёт, если не существует
-    print(settings.VECTOR_STORE_DIR)
+    logger.info("Chroma PersistentClient: %s", settings.VECTOR_STORE_DIR)
     return chromadb.PersistentClient(path=settings.VECTOR_STORE_DIR)
 
-def get_chroma_collection(client: chromadb.ClientAPI) -> Collection:
+def get_chroma_collection(client: chromadb.ClientAPI, name: Optional[str] = None) -> Collection:
     """Инициализирует и возвращает коллекцию ChromaDB.
 
     Args:
         client: Клиент Chroma DB
+        name: Имя коллекции (по умолчанию CHROMA_COLLECTION_NAME)
     Raises:
         RuntimeError: Если не удалось инициализировать коллекцию ChromaDB.
 
     Returns:
         Коллекция ChromaDB для работы с данными.
     """
+    name = name or settings.CHROMA_COLLECTION_NAME
+    key = (id(client), name)
+    cached = _collections.get(key)
+    if cached is not None:
+        return cached[1]
     try:
-        return client.get_or_create_collection(name=settings.CHROMA_COLLECTION_NAME)
+        collection = client.get_or_create_collection(name=name)
     except Exception as e:
         raise RuntimeError(
             f"Ошибка инициализации коллекции ChromaDB: {str(e)}"
         ) from e
+    _collections[key] = (client, collection)
+    return collection
 
 
 
 def delete_collection():
     """Удаляет указанную коллекцию в ChromaDB."""
     try:
-        client = chromadb.Client(
-            Settings(persist_directory=settings.VECTOR_STORE_DIR)
-        )
+        client = get_chroma_client()
         client.delete_collection(name=settings.CHROMA_COLLECTION_NAME)
+        _collections.clear()
         logger.info(f"Коллекция '{settings.CHROMA_COLLECTION_NAME}' успешно удалена.")
     except Exception as e:
         logger.error(f"Ошибка при удалении коллекции: {e}", exc_info=True)
\ No newline at end of file
@@ -11,66 +11,259 @@
 # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
 # GNU Affero General Public License for more details.
 
+import heapq
+import logging
 import re
+import threading
 import uuid
+from functools import lru_cache
 from datetime import datetime, timedelta, timezone
 from typing import Optional, List, Dict, Any
 
 import pymorphy3
 from ruwordnet import RuWordNet
 
-from infrastructure.embeddings.embedding_manager import EmbeddingManager
+from infrastructure.embeddings.embedding_cache import get_or_compute, get_or_compute_one
 from infrastructure.logging.logger import setup_logger
 from infrastructure.vector_store.client import get_chroma_client, get_chroma_collection
 from models.user_enums import UserMoodLevel, Mood
+from settings import settings
 
 logger = setup_logger("memory_builder")
 
+# Всё, что не буква/цифра/пробел (эмодзи, пунктуация), заменяем пробелом
+_NON_WORD_RE = re.compile(r'[^\w\s]')
+# Границы предложений для multi-query
+_SENTENCE_SPLIT_RE = re.compile(r'[.!?]+')
+# Сообщения не длиннее этого ищутся одним запросом, без синонимов
+_SHORT_MESSAGE_LEN = 80
+# Сколько ключевых слов дописывать к сообщению в обогащённом запросе
+_ENRICHED_MAX_KEYWORDS = 20
+
+# Стоп-слова (частые слова без смысла)
+_STOP_WORDS = frozenset({
+    'а', 'и', 'в', 'на', 'с', 'у', 'к', 'о', 'из', 'за', 'по', 'от', 'до',
+    'что', 'как', 'это', 'так', 'ты', 'я', 'мы', 'он', 'она', 'они', 'вы',
+    'не', 'да', 'но', 'же', 'ли', 'бы', 'то', 'ещё', 'еще', 'уже', 'вот',
+    'все', 'всё', 'мне', 'меня', 'тебе', 'тебя', 'нам', 'нас', 'мой', 'твой',
+    'если', 'когда', 'чтобы', 'потому', 'очень', 'только', 'просто', 'прям',
+    'какие', 'какой', 'какая', 'какое', 'который', 'которая', 'которое',
+    'хочешь', 'хочу', 'могу', 'можешь', 'буду', 'будет', 'есть', 'был', 'была',
+    'опять', 'снова', 'теперь', 'сейчас', 'тоже', 'также', 'быть', 'этот'
+})
+
+
+def _tokenize(text: str) -> list[str]:
+    """Нижний регистр, без эмодзи и пунктуации, по пробелам."""
+    return _NON_WORD_RE.sub(' ', text.lower()).split()
+
 # Инициализируем морфологический анализатор (singleton)
 _morph_analyzer = None
 _ruwordnet = None
+# Конкурентные первые вызовы ждут одну инициализацию (и одно скачивание базы)
+_morph_lock = threading.Lock()
+_ruwordnet_lock = threading.Lock()
 
 def get_morph_analyzer():
     """Ленивая инициализация морфологического анализатора."""
     global _morph_analyzer
     if _morph_analyzer is None:
-        _morph_analyzer = pymorphy3.MorphAnalyzer()
+        with _morph_lock:
+            if _morph_analyzer is None:
+                _morph_analyzer = pymorphy3.MorphAnalyzer()
     return _morph_analyzer
 
 def get_ruwordnet():
     """Ленивая инициализация RuWordNet с автоматическим скачиванием базы."""
     global _ruwordnet
     if _ruwordnet is None:
-        try:
-            _ruwordnet = RuWordNet()
-            logger.info("[RUWORDNET] Инициализирован успешно")
-        except Exception as e:
-            # Если база не найдена — пробуем скачать
-            if "was not found" in str(e) or "ruwordnet.db" in str(e):
-                logger.info("[RUWORDNET] База не найдена, скачиваю...")
+        with _ruwordnet_lock:
+            if _ruwordnet is None:
                 try:
-                    import subprocess
-                    result = subprocess.run(
-                        ["ruwordnet", "download"], 
-                        capture_output=True, 
-                        text=True,
-                        timeout=300  # 5 минут на скачивание
-                    )
-                    if result.returncode == 0:
-                        logger.info("[RUWORDNET] База скачана успешно, инициализирую...")
-                        _ruwordnet = RuWordNet()
-                        logger.info("[RUWORDNET] Инициализирован успешно")
+                    _ruwordnet = RuWordNet()
+                    logger.info("[RUWORDNET] Инициализирован успешно")
+                except Exception as e:
+                    # Если база не найдена — пробуем скачать
+                    if "was not found" in str(e) or "ruwordnet.db" in str(e):
+                        logger.info("[RUWORDNET] База не найдена, скачиваю...")
+                        try:
+                            import subprocess
+                            result = subprocess.run(
+                                ["ruwordnet", "download"], 
+                                capture_output=True, 
+                                text=True,
+                                timeout=300  # 5 минут на скачивание
+                            )
+                            if result.returncode == 0:
+                                logger.info("[RUWORDNET] База скачана успешно, инициализирую...")
+                                _ruwordnet = RuWordNet()
+                                logger.info("[RUWORDNET] Инициализирован успешно")
+                            else:
+                                logger.warning(f"[RUWORDNET] Не удалось скачать базу: {result.stderr}")
+                                _ruwordnet = False
+                        except Exception as download_error:
+                            logger.warning(f"[RUWORDNET] Ошибка при скачивании: {download_error}")
+                            _ruwordnet = False
                     else:
-                        logger.warning(f"[RUWORDNET] Не удалось скачать базу: {result.stderr}")
+                        logger.warning(f"[RUWORDNET] Не удалось инициализировать: {e}")
                         _ruwordnet = False
-                except Exception as download_error:
-                    logger.warning(f"[RUWORDNET] Ошибка при скачивании: {download_error}")
-                    _ruwordnet = False
-            else:
-                logger.warning(f"[RUWORDNET] Не удалось инициализировать: {e}")
-                _ruwordnet = False
     return _ruwordnet if _ruwordnet else None
 
+@lru_cache(maxsize=50000)
+def _lemma(word: str) -> str:
+    """
+    Лемма слова через pymorphy3 с кэшем.
+
+    Русский текст сильно повторяется по словам, поэтому после прогрева
+    большинство токенов не доходит до MorphAnalyzer.parse.
+    """
+    try:
+        return get_morph_analyzer().parse(word)[0].normal_form
+    except Exception:
+        return word
+
+@lru_cache(maxsize=20000)
+def _synonyms(word: str) -> frozenset[str]:
+    """Получает синонимы и гипонимы из RuWordNet."""
+    wn = get_ruwordnet()
+    if not wn:
+        return frozenset()
+    
+    synonyms = set()
+    
+    try:
+        # Ищем все синсеты для слова
+        synsets = wn.get_synsets(word)
+        
+        for synset in synsets[:3]:  # Ограничиваем количество значений (для скорости)
+            # Берём синонимы из synset (слова с тем же значением)
+            for sense in synset.senses:
+                lemma = sense.name.lower()
+                if lemma != word:  # Не добавляем само слово
+                    synonyms.add(lemma)
+            
+            # Добавляем гипонимы (более узкие понятия)
+            # Например: цветок → роза, тюльпан
+            for hypo_synset in synset.hyponyms[:5]:  # Ограничиваем
+                for sense in hypo_synset.senses[:3]:
+                    synonyms.add(sense.name.lower())
+    
+    except Exception as e:
+        logger.debug("[SYNONYMS] Не найдено для '%s': %s", word, e)
+    
+    if synonyms:
+        logger.debug("[SYNONYMS] '%s' → %s", word, synonyms)
+    
+    return frozenset(synonyms)
+
+@lru_cache(maxsize=10000)
+def _parse_naive_datetime(value: str) -> Optional[datetime]:
+    """
+    ISO-строка из метаданных → naive datetime (None, если формат повреждён).
+
+    С Python 3.11 fromisoformat сам понимает 'Z' и смещения. Одни и те же
+    last_used/created_at встречаются в каждом запросе, поэтому кэшируем.
+    """
+    try:
+        return datetime.fromisoformat(value).replace(tzinfo=None)
+    except (ValueError, TypeError):
+        return None
+
+def last_used_ts(value: Any) -> int:
+    """
+    last_used (datetime или ISO-строка) → epoch-секунды для фильтра в Chroma.
+
+    Chroma сравнивает через $lt только числа, поэтому рядом с ISO-строкой
+    храним last_used_ts. Никогда не использованные записи получают 0.
+    """
+    if not value:
+        return 0
+    try:
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        return int(value.timestamp())
+    except (ValueError, TypeError, AttributeError):
+        return 0
+
+def with_last_used_ts(metadata: dict) -> dict:
+    """Дописывает в метаданные last_used_ts, если его нет."""
+    if "last_used_ts" not in metadata:
+        metadata["last_used_ts"] = last_used_ts(metadata.get("last_used"))
+    return metadata
+
+def bump_usage(old_metadata: dict, hits: int, used_at: datetime) -> dict:
+    """
+    Только изменившиеся ключи: frequency + hits и last_used (+ last_used_ts).
+
+    collection.update сливает метаданные, поэтому остальные ключи не
+    переписываем — правка из update_entry между get и update не потеряется.
+    """
+    return {
+        'frequency': int(old_metadata.get('frequency', 0)) + hits,
+        'last_used': used_at.isoformat(),
+        'last_used_ts': int(used_at.timestamp()),
+    }
+
+class _UsageWriteBack:
+    """
+    Отложенная запись frequency/last_used в Chroma.
+
+    Обращения к воспоминаниям копятся в памяти и через delay секунд
+    пишутся одним collection.get + collection.update на коллекцию,
+    вместо get + update на каждое обращение.
+    """
+
+    def __init__(self, delay: float = 2.0):
+        self.delay = delay
+        self._lock = threading.Lock()
+        # id(collection) -> (collection, {doc_id: (обращений, время последнего)})
+        self._pending: dict[int, tuple[Any, dict[str, tuple[int, datetime]]]] = {}
+        self._timer: Optional[threading.Timer] = None
+
+    def add(self, collection, doc_id: str) -> None:
+        with self._lock:
+            _, hits = self._pending.setdefault(id(collection), (collection, {}))
+            count, _ = hits.get(doc_id, (0, None))
+            hits[doc_id] = (count + 1, datetime.now())
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        for collection, hits in pending.values():
+            try:
+                results = collection.get(ids=list(hits), include=["metadatas"])
+                ids, metadatas = [], []
+                for doc_id, old_metadata in zip(results["ids"], results["metadatas"]):
+                    if old_metadata is None:
+                        continue
+                    count, used_at = hits[doc_id]
+                    ids.append(doc_id)
+                    metadatas.append(bump_usage(old_metadata, count, used_at))
+
+                missing = len(hits) - len(ids)
+                if missing:
+                    logger.warning("[SKIP] %d документов не найдено при обновлении использования", missing)
+                if ids:
+                    # Только metadata — без пересборки HNSW-индекса
+                    collection.update(ids=ids, metadatas=metadatas)
+                    logger.info("[OK] Обновлено использование %d воспоминаний", len(ids))
+            except Exception:
+                logger.exception("[ERROR] Ошибка при записи использования воспоминаний")
+
+_usage_write_back = _UsageWriteBack()
+
+def flush_memory_usage() -> None:
+    """Сразу пишет накопленные обращения к воспоминаниям (например, при shutdown)."""
+    _usage_write_back.flush()
+
 def safe_metadata(**kwargs) -> dict:
     return {k: v for k, v in kwargs.items() if v is not None}
 
@@ -95,7 +288,7 @@ class PersonaEmbeddingPipeline:
         external_id: Optional[str] = None,
     ) -> None:
         """Добавляет одну запись в ChromaDB с эмбеддингами и метаданными."""
-        embedding = EmbeddingManager.get_embedding(memory).tolist()
+        embedding = get_or_compute_one(memory).tolist()
 
         metadata = safe_metadata(
             account_id=account_id,
@@ -105,6 +298,7 @@ class PersonaEmbeddingPipeline:
             has_critical=has_critical,
             frequency=frequency,
             last_used=last_used.isoformat() if last_used else None,
+            last_used_ts=last_used_ts(last_used),
             mood=mood.value,
             mood_level=mood_level.value,
             created_at=datetime.now(timezone.utc).isoformat()
@@ -120,7 +314,8 @@ class PersonaEmbeddingPipeline:
     def add_batch(self, entries: list[dict]) -> None:
         """Добавляет список записей в ChromaDB."""
         texts = [e["text"] for e in entries]
-        embeddings = [EmbeddingManager.get_embedding(t).tolist() for t in texts]
+        embeddings = get_or_compute(texts).tolist()
+        created_at = datetime.now(timezone.utc).isoformat()
 
         metadatas = [
             safe_metadata(
@@ -131,8 +326,9 @@ class PersonaEmbeddingPipeline:
                 has_critical=e.get("has_critical", False),
                 frequency=e.get("frequency"),
                 last_used=e.get("last_used").isoformat() if e.get("last_used") else None,
+                last_used_ts=last_used_ts(e.get("last_used")),
                 source=e.get("source"),
-                created_at=datetime.now(timezone.utc).isoformat(),
+                created_at=created_at,
             )
             for e in entries
         ]
@@ -145,118 +341,47 @@ class PersonaEmbeddingPipeline:
             ids=ids,
         )
 
-    def update_entry(self, entry_id: str, new_text: Optional[str] = None, new_metadata: Optional[dict] = None):
-        """Обновляет запись в коллекции по ID."""
-        self.collection.delete(ids=[entry_id])
-
-        text = new_text or "PLACEHOLDER"
-        embedding = EmbeddingManager.get_embedding(text).tolist()
-
-        self.collection.add(
-            documents=[text],
-            embeddings=[embedding],
-            metadatas=[new_metadata or {}],
-            ids=[entry_id],
-        )
-
     def _split_to_sentences(self, message: str) -> list[str]:
         """Разбивает сообщение на значимые предложения для multi-query поиска."""
-        import re
         # Разбиваем по точкам, восклицательным, вопросительным знакам
-        sentences = re.split(r'[.!?]+', message)
         # Фильтруем короткие фрагменты (меньше 25 символов обычно не несут смысла)
-        sentences = [s.strip() for s in sentences if len(s.strip()) > 25]
-        return sentences
+        return [s for s in map(str.strip, _SENTENCE_SPLIT_RE.split(message)) if len(s) > 25]
 
     def _normalize_word(self, word: str) -> str:
         """Приводит слово к нормальной форме (лемме) с помощью pymorphy2."""
-        try:
-            morph = get_morph_analyzer()
-            parsed = morph.parse(word)[0]
-            return parsed.normal_form
-        except Exception:
-            return word
+        return _lemma(word)
 
-    def _get_synonyms(self, word: str) -> set[str]:
+    def _get_synonyms(self, word: str) -> frozenset[str]:
         """Получает синонимы и гипонимы из RuWordNet."""
-        wn = get_ruwordnet()
-        if not wn:
-            return set()
-        
-        synonyms = set()
-        
-        try:
-            # Ищем все синсеты для слова
-            synsets = wn.get_synsets(word)
-            
-            for synset in synsets[:3]:  # Ограничиваем количество значений (для скорости)
-                # Берём синонимы из synset (слова с тем же значением)
-                for sense in synset.senses:
-                    lemma = sense.name.lower()
-                    if lemma != word:  # Не добавляем само слово
-                        synonyms.add(lemma)
-                
-                # Добавляем гипонимы (более узкие понятия)
-                # Например: цветок → роза, тюльпан
-                for hypo_synset in synset.hyponyms[:5]:  # Ограничиваем
-                    for sense in hypo_synset.senses[:3]:
-                        synonyms.add(sense.name.lower())
-        
-        except Exception as e:
-            logger.debug(f"[SYNONYMS] Не найдено для '{word}': {e}")
-        
-        if synonyms:
-            logger.debug(f"[SYNONYMS] '{word}' → {synonyms}")
-        
-        return synonyms
+        return _synonyms(word)
 
     def _extract_keywords(self, message: str, expand_synonyms: bool = True) -> set[str]:
         """Извлекает ключевые слова из сообщения, нормализует и расширяет синонимами."""
-        # Убираем эмодзи, пунктуацию и приводим к нижнему регистру
-        clean = re.sub(r'[^\w\s]', ' ', message.lower())
-        words = clean.split()
-        
-        # Стоп-слова (частые слова без смысла)
-        stop_words = {
-            'а', 'и', 'в', 'на', 'с', 'у', 'к', 'о', 'из', 'за', 'по', 'от', 'до',
-            'что', 'как', 'это', 'так', 'ты', 'я', 'мы', 'он', 'она', 'они', 'вы',
-            'не', 'да', 'но', 'же', 'ли', 'бы', 'то', 'ещё', 'еще', 'уже', 'вот',
-            'все', 'всё', 'мне', 'меня', 'тебе', 'тебя', 'нам', 'нас', 'мой', 'твой',
-            'если', 'когда', 'чтобы', 'потому', 'очень', 'только', 'просто', 'прям',
-            'какие', 'какой', 'какая', 'какое', 'который', 'которая', 'которое',
-            'хочешь', 'хочу', 'могу', 'можешь', 'буду', 'будет', 'есть', 'был', 'была',
-            'опять', 'снова', 'теперь', 'сейчас', 'тоже', 'также', 'быть', 'этот'
-        }
-        
+        words = _tokenize(message)
+
         # Фильтруем и нормализуем: только слова длиннее 3 символов, не стоп-слова
         keywords = set()
-        base_lemmas = []  # Сохраняем для расширения синонимами
-        
+
         for w in words:
-            if len(w) > 3 and w not in stop_words:
+            if len(w) > 3 and w not in _STOP_WORDS:
                 lemma = self._normalize_word(w)
-                if lemma not in stop_words:
+                if lemma not in _STOP_WORDS:
                     keywords.add(lemma)
-                    base_lemmas.append(lemma)
-        
-        # Расширяем синонимами (только для основных слов, не для самих синонимов)
+
+        # Расширяем синонимами (только для основных слов, не для самих синонимов;
+        # каждую лемму — один раз, даже если слово повторяется в сообщении)
         if expand_synonyms:
-            for lemma in base_lemmas:
+            for lemma in list(keywords):
                 synonyms = self._get_synonyms(lemma)
                 keywords.update(synonyms)
         
-        logger.debug(f"[KEYWORDS] Извлечено {len(keywords)} ключевых слов (с синонимами): {list(keywords)[:10]}...")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("[KEYWORDS] Извлечено %d ключевых слов (с синонимами): %s...", len(keywords), list(keywords)[:10])
         return keywords
 
     def _extract_lemmas_from_text(self, text: str) -> set[str]:
         """Извлекает леммы из текста для сравнения."""
-        clean = re.sub(r'[^\w\s]', ' ', text.lower())
-        words = clean.split()
-        lemmas = set()
-        for w in words:
-            if len(w) > 3:
-                lemmas.add(self._normalize_word(w))
-        return lemmas
+        return {self._normalize_word(w) for w in _tokenize(text) if len(w) > 3}
 
     def _apply_keyword_boost(self, results: dict, keywords: set[str], boost_factor: float = 0.25) -> dict:
         """
@@ -264,6 +389,8 @@ class PersonaEmbeddingPipeline:
         1. Совпадение лемм (pymorphy2) — базовый буст
         2. Точное совпадение слова в тексте — дополнительный буст
         """
+        debug = logger.isEnabledFor(logging.DEBUG)
+
         for result in results.values():
             text_lower = result["text"].lower()
             text_lemmas = self._extract_lemmas_from_text(result["text"])
@@ -277,7 +404,9 @@ class PersonaEmbeddingPipeline:
             if lemma_matches > 0:
                 # Уменьшаем score за совпадения лемм
                 result["score"] = max(0.01, result["score"] - (lemma_matches * boost_factor))
-                logger.debug(f"[LEMMA-BOOST] '{result['text'][:50]}...' lemmas={matched_lemmas}, score: {original_score:.3f} → {result['score']:.3f}")
+                if debug:
+                    logger.debug("[LEMMA-BOOST] '%s...' lemmas=%s, score: %.3f → %.3f",
+                                 result['text'][:50], matched_lemmas, original_score, result['score'])
             
             # 2. Дополнительный буст для точных совпадений (слово в исходной форме)
             exact_matches = []
@@ -286,89 +415,70 @@ class PersonaEmbeddingPipeline:
                     exact_matches.append(kw)
                     result["score"] = max(0.01, result["score"] - boost_factor)
             
-            if exact_matches:
-                logger.debug(f"[EXACT-MATCH] exact={exact_matches} в '{result['text'][:50]}...' score → {result['score']:.3f}")
+            if exact_matches and debug:
+                logger.debug("[EXACT-MATCH] exact=%s в '%s...' score → %.3f",
+                             exact_matches, result['text'][:50], result['score'])
         
         return results
 
-    def _apply_recency_boost(self, results: dict) -> dict:
+    def _apply_metadata_boosts(self, results: dict) -> dict:
         """
-        Применяет временной штраф к результатам.
-        - impressive=4 НЕ получает штраф (важные факты всегда актуальны)
-        - Остальные: очень старые воспоминания (>60 дней) получают небольшой штраф
-        
+        Применяет бусты по метаданным за один проход по результатам.
+
+        1. Impressive boost (важные воспоминания выше):
+           - impressive=4 → большой буст (-0.12)
+           - impressive=3 → маленький буст (-0.05)
+           - impressive=2,1 → нет буста
+        2. Recency penalty (штраф для очень старых воспоминаний):
+           - impressive=4 НЕ получает штраф (важные факты всегда актуальны)
+           - Остальные: очень старые воспоминания (>60 дней) получают небольшой штраф
+
         Примечание: совсем свежие уже отфильтрованы через days_cutoff в query_similar.
         """
         now = datetime.now()
-        
+        debug = logger.isEnabledFor(logging.DEBUG)
+
         for result in results.values():
-            # impressive=4 не гасим по времени — это важные факты
-            impressive = result.get("metadata", {}).get("impressive")
+            metadata = result.get("metadata") or {}
+
+            # Приводим к int (может быть float из ChromaDB); None — нет буста
+            impressive = metadata.get("impressive")
             try:
-                impressive = int(impressive) if impressive is not None else 0
+                impressive = int(impressive) if impressive is not None else None
             except (ValueError, TypeError):
-                impressive = 0
-                
-            if impressive >= 4:
-                # Не применяем recency penalty к очень важным воспоминаниям
+                impressive = None
+
+            # 1. Impressive boost
+            if impressive is not None and impressive >= 3:
+                original_score = result["score"]
+                result["score"] = max(0.01, original_score - (0.12 if impressive >= 4 else 0.05))
+                if debug:
+                    logger.debug("[IMPRESSIVE-BOOST] '%s...' impressive=%d, score: %.3f → %.3f",
+                                 result['text'][:40], impressive, original_score, result['score'])
+
+            # 2. Recency penalty — impressive=4 не гасим по времени, это важные факты
+            if impressive is not None and impressive >= 4:
                 continue
-            
-            last_used_str = result.get("metadata", {}).get("last_used")
-            created_at_str = result.get("metadata", {}).get("created_at")
-            
+
             # Используем last_used или created_at
-            date_str = last_used_str or created_at_str
+            date_str = metadata.get("last_used") or metadata.get("created_at")
             if not date_str:
                 continue
-                
-            try:
-                memory_date = datetime.fromisoformat(date_str.replace('+00:00', '').replace('Z', ''))
-                memory_date = memory_date.replace(tzinfo=None)
-                days_ago = (now - memory_date).days
-                
-                # Штраф для очень старых воспоминаний (>60 дней)
-                if days_ago > 60:
-                    penalty = min(0.1, (days_ago - 60) * 0.001)  # макс +0.1 к distance
-                    result["score"] += penalty
-                    logger.debug(f"[RECENCY-PENALTY] '{result['text'][:40]}...' days_ago={days_ago}, penalty=+{penalty:.3f}")
-                    
-            except (ValueError, TypeError) as e:
-                logger.debug(f"[RECENCY] Не удалось распарсить дату: {date_str}, ошибка: {e}")
-                continue
-        
-        return results
 
-    def _apply_impressive_boost(self, results: dict) -> dict:
-        """
-        Применяет буст на основе важности (impressive) воспоминания.
-        - impressive=4 → большой буст (-0.12)
-        - impressive=3 → маленький буст (-0.05)
-        - impressive=2,1 → нет буста
-        """
-        for result in results.values():
-            impressive = result.get("metadata", {}).get("impressive")
-            
-            if impressive is None:
-                continue
-            
-            # Приводим к int (может быть float из ChromaDB)
-            try:
-                impressive = int(impressive)
-            except (ValueError, TypeError):
+            memory_date = _parse_naive_datetime(date_str)
+            if memory_date is None:
+                logger.debug("[RECENCY] Не удалось распарсить дату: %s", date_str)
                 continue
-            
-            original_score = result["score"]
-            
-            if impressive >= 4:
-                # Большой буст для очень важных воспоминаний
-                result["score"] = max(0.01, original_score - 0.12)
-                logger.debug(f"[IMPRESSIVE-BOOST] '{result['text'][:40]}...' impressive={impressive}, score: {original_score:.3f} → {result['score']:.3f}")
-            elif impressive == 3:
-                # Маленький буст для важных воспоминаний
-                result["score"] = max(0.01, original_score - 0.05)
-                logger.debug(f"[IMPRESSIVE-BOOST] '{result['text'][:40]}...' impressive={impressive}, score: {original_score:.3f} → {result['score']:.3f}")
-            # impressive <= 2 — нет буста
-        
+            days_ago = (now - memory_date).days
+
+            # Штраф для очень старых воспоминаний (>60 дней)
+            if days_ago > 60:
+                penalty = min(0.1, (days_ago - 60) * 0.001)  # макс +0.1 к distance
+                result["score"] += penalty
+                if debug:
+                    logger.debug("[RECENCY-PENALTY] '%s...' days_ago=%d, penalty=+%.3f",
+                                 result['text'][:40], days_ago, penalty)
+
         return results
 
     def query_similar_multi(
@@ -393,47 +503,64 @@ class PersonaEmbeddingPipeline:
         Returns:
             Список уникальных релевантных memories, отсортированных по score
         """
-        # Извлекаем ключевые слова для boost
-        keywords = self._extract_keywords(message)
-        logger.debug(f"[MULTI-QUERY] Ключевые слова для boost: {keywords}")
-
-        # Формируем список запросов
-        queries = [message]  # всегда включаем полное сообщение
-
-        # Добавляем отдельные предложения (если сообщение достаточно длинное)
-        if len(message) > 80:
-            sentences = self._split_to_sentences(message)
-            queries.extend(sentences[:4])  # максимум 4 предложения
-
-        logger.debug(f"[MULTI-QUERY] Сформировано {len(queries)} запросов для поиска")
+        short = len(message) <= _SHORT_MESSAGE_LEN
 
-        all_results = {}
+        # Извлекаем ключевые слова для boost (для коротких — без RuWordNet)
+        keywords = self._extract_keywords(message, expand_synonyms=not short)
+        logger.debug("[MULTI-QUERY] Ключевые слова для boost: %s", keywords)
 
-        for query in queries:
+        if short:
+            # Быстрый путь: одно полное сообщение, один запрос, без дедупликации
             results = self.query_similar(
                 account_id=account_id,
-                query=query,
+                query=message,
+                top_k=per_query_k,
+                days_cutoff=days_cutoff
+            )
+            all_results = {r["id"]: r for r in results}
+        elif settings.MEMORY_ENRICHED_QUERY:
+            # Один обогащённый запрос вместо запроса на каждое предложение
+            results = self.query_similar_enriched(
+                account_id=account_id,
+                message=message,
+                keywords=keywords,
+                top_k=top_k * 3,
+                days_cutoff=days_cutoff
+            )
+            all_results = {r["id"]: r for r in results}
+        else:
+            # Полное сообщение + отдельные предложения (максимум 4)
+            queries = [message]
+            queries.extend(self._split_to_sentences(message)[:4])
+            logger.debug("[MULTI-QUERY] Сформировано %d запросов для поиска", len(queries))
+
+            all_results = {}
+
+            # Все запросы кодируем одним батчем и отправляем в Chroma одним query
+            embeddings = get_or_compute(queries).tolist()
+            per_query_results = self.query_similar_with_embeddings(
+                account_id=account_id,
+                embeddings=embeddings,
                 top_k=per_query_k,
                 days_cutoff=days_cutoff
             )
-            for r in results:
-                # Храним лучший (меньший) score для каждого документа
-                if r["id"] not in all_results or r["score"] < all_results[r["id"]]["score"]:
-                    all_results[r["id"]] = r
+
+            for results in per_query_results:
+                for r in results:
+                    # Храним лучший (меньший) score для каждого документа
+                    if r["id"] not in all_results or r["score"] < all_results[r["id"]]["score"]:
+                        all_results[r["id"]] = r
 
         # Применяем keyword boost (лемматизация через pymorphy2)
         all_results = self._apply_keyword_boost(all_results, keywords)
         
-        # Применяем impressive boost (важные воспоминания выше)
-        all_results = self._apply_impressive_boost(all_results)
-        
-        # Применяем recency boost (штраф для очень старых воспоминаний)
-        all_results = self._apply_recency_boost(all_results)
+        # Применяем impressive boost и recency penalty (один проход по метаданным)
+        all_results = self._apply_metadata_boosts(all_results)
 
-        # Сортируем по score (меньше = лучше для distance) и возвращаем top_k
-        sorted_results = sorted(all_results.values(), key=lambda x: x["score"])
-        logger.info(f"[MULTI-QUERY] Найдено {len(all_results)} уникальных результатов, возвращаем {min(top_k, len(sorted_results))}")
-        return sorted_results[:top_k]
+        # top_k лучших по score (меньше = лучше для distance), без сортировки всего набора
+        top_results = heapq.nsmallest(top_k, all_results.values(), key=lambda x: x["score"])
+        logger.info("[MULTI-QUERY] Найдено %d уникальных результатов, возвращаем %d", len(all_results), len(top_results))
+        return top_results
 
     def query_similar(
             self,
@@ -446,140 +573,102 @@ class PersonaEmbeddingPipeline:
         Находит top_k ближайших по смыслу записей к запросу,
         исключая те, что использовались менее чем N дней назад.
         """
-        embedding = EmbeddingManager.get_embedding(query).tolist()
-        results = self.collection.query(
-            query_embeddings=[embedding], 
-            n_results=top_k * 2, 
-            where={"account_id": account_id},
-            include=["documents", "metadatas", "distances", "embeddings"]  # embeddings для детерминированности
-        )
-        logger.info(results)
-
-        # Пороговая дата (например, 5 дней назад)
-        threshold_date = datetime.now() - timedelta(days=days_cutoff)
-
-        # Отфильтровываем по last_used
-        filtered = []
-        for res_id, doc, meta, score in zip(
-                results["ids"][0],
-                results["documents"][0],
-                results["metadatas"][0],
-                results["distances"][0],
-        ):
-            last_used_str = meta.get("last_used")
-            if last_used_str:
-                try:
-                    last_used_dt = datetime.fromisoformat(last_used_str)
-                    last_used_dt = last_used_dt.replace(tzinfo=None)  # сделать naive
-                    if last_used_dt >= threshold_date:
-                        continue  # пропускаем, если слишком недавно использовалось
-                except ValueError:
-                    pass  # если вдруг формат повреждён — просто не фильтруем
+        embedding = get_or_compute_one(query).tolist()
+        return self.query_similar_with_embeddings(account_id, [embedding], top_k, days_cutoff)[0]
 
-            filtered.append({
-                "id": res_id,
-                "text": doc,
-                "metadata": meta,
-                "score": round(score, 3),
-            })
+    def query_similar_enriched(
+            self,
+            account_id: str,
+            message: str,
+            keywords: set[str],
+            top_k: int = 15,
+            days_cutoff: int = 2,
+    ) -> list[dict]:
+        """
+        Поиск одним запросом: сообщение + ключевые слова (с синонимами)
+        в одной строке. Один эмбеддинг и один HNSW-поиск вместо multi-query
+        ценой небольшой потери полноты.
+        """
+        # sorted — чтобы одинаковое сообщение давало одинаковый текст (и попадание в кэш эмбеддингов)
+        enriched = " ".join([message, *sorted(keywords)[:_ENRICHED_MAX_KEYWORDS]])
+        return self.query_similar(account_id, enriched, top_k, days_cutoff)
 
-            if len(filtered) >= top_k:
-                break
+    def query_similar_with_embeddings(
+            self,
+            account_id: str,
+            embeddings: list[list[float]],
+            top_k: int = 3,
+            days_cutoff: int = 2,
+    ) -> list[list[dict]]:
+        """
+        То же, что query_similar, но сразу для нескольких готовых эмбеддингов
+        запросов — одним вызовом collection.query. Возвращает список
+        результатов на каждый эмбеддинг в том же порядке.
+        """
+        # Пороговая дата (например, 5 дней назад): недавно использованные
+        # отсекаются фильтром в самой Chroma, без добора top_k * 2
+        threshold_ts = int((datetime.now() - timedelta(days=days_cutoff)).timestamp())
+        results = self.collection.query(
+            query_embeddings=embeddings,
+            n_results=top_k,
+            where={"$and": [
+                {"account_id": account_id},
+                {"last_used_ts": {"$lt": threshold_ts}},
+            ]},
+            include=["documents", "metadatas", "distances"],
+        )
+        # Полный ответ Chroma — только в DEBUG (форматирование большого dict не бесплатно)
+        logger.debug("[QUERY] %s", results)
 
-        return filtered
+        return [
+            [
+                {
+                    "id": res_id,
+                    "text": doc,
+                    "metadata": meta,
+                    "score": round(score, 3),
+                }
+                for res_id, doc, meta, score in zip(
+                    results["ids"][i],
+                    results["documents"][i],
+                    results["metadatas"][i],
+                    results["distances"][i],
+                )
+            ]
+            for i in range(len(embeddings))
+        ]
 
     def update_memory_usage_by_id(self, doc_id: str):
-        """Обновляет frequency и last_used по ID документа (без поиска)."""
-        try:
-            # 1. Получаем данные по ID
-            results = self.collection.get(
-                ids=[doc_id],
-                include=["embeddings", "documents", "metadatas"]
-            )
-            
-            if not results or not results['ids']:
-                logger.warning(f"[SKIP] Документ с ID {doc_id} не найден")
-                return
-
-            old_metadata = results.get('metadatas', [None])[0]
-            old_embedding = results.get('embeddings', [None])[0]
-            document = results.get('documents', [None])[0]
-
-            if any(x is None for x in (old_metadata, old_embedding, document)):
-                logger.warning(f"[SKIP] Документ с ID {doc_id} не содержит всех нужных данных.")
-                return
-
-            # 2. Удаляем старую запись
-            self.collection.delete(ids=[doc_id])
-
-            # 3. Обновляем metadata
-            updated_metadata = old_metadata.copy()
-            updated_metadata['frequency'] = int(old_metadata.get('frequency', 0)) + 1
-            updated_metadata['last_used'] = datetime.now().isoformat()
-
-            # 4. Добавляем заново
-            self.collection.add(
-                documents=[document],
-                embeddings=[old_embedding],
-                metadatas=[updated_metadata],
-                ids=[doc_id]
-            )
-
-            logger.info(f"[OK] Обновлено по ID: {doc_id}")
+        """
+        Отмечает обращение к воспоминанию: frequency + 1 и last_used.
 
-        except Exception as e:
-            logger.exception(f"[ERROR] Ошибка при обновлении документа по ID {doc_id}: {e}")
+        Запись отложенная — обращения копятся и уходят в Chroma одним
+        update (см. _UsageWriteBack), не на пути ответа пользователю.
+        """
+        _usage_write_back.add(self.collection, doc_id)
+        logger.debug("[USAGE] Обращение к %s поставлено в очередь", doc_id)
 
     def update_memory_usage(self, account_id: str, target_doc: str):
         """Обновляет frequency и last_used через поиск по эмбеддингу (fallback)."""
 
         try:
-            # 1. Поиск ближайшего документа по эмбеддингу
-            result = self.collection.query(query_texts=[target_doc], n_results=1, where={"account_id": account_id})
-            logger.debug(f"result: {result}")
+            # 1. Поиск ближайшего документа по эмбеддингу (той же моделью и
+            # через тот же кэш, что и при записи, а не функцией Chroma)
+            embedding = get_or_compute_one(target_doc).tolist()
+            result = self.collection.query(
+                query_embeddings=[embedding],
+                n_results=1,
+                where={"account_id": account_id},
+                include=["distances"],
+            )
+            logger.debug("result: %s", result)
 
             if not result or not result['ids'] or not result['ids'][0]:
                 logger.warning(f"[SKIP] Ничего не найдено по эмбеддингу: {target_doc[:80]}...")
                 return
 
-            doc_id = result['ids'][0][0]
-
-            # 2. Получаем данные по найденному ID
-            results = self.collection.get(
-                ids=[doc_id],
-                include=["embeddings", "documents", "metadatas"]
-            )
-            if results is None:
-                logger.warning(f"[SKIP] Не удалось получить документ по ID: {doc_id}")
-                return
-
-            # 3. Проверка, что все поля есть
-            old_metadata = results.get('metadatas', [None])[0]
-            old_embedding = results.get('embeddings', [None])[0]
-            document = results.get('documents', [None])[0]
-
-            # 3. Проверка, что все поля есть
-            if any(x is None for x in (old_metadata, old_embedding, document)):
-                logger.warning(f"[SKIP] Документ с ID {doc_id} не содержит всех нужных данных.")
-                return
-
-            # 4. Удаляем старую запись
-            self.collection.delete(ids=[doc_id])
-
-            # 5. Обновляем metadata
-            updated_metadata = old_metadata.copy()
-            updated_metadata['frequency'] = int(old_metadata.get('frequency', 0)) + 1
-            updated_metadata['last_used'] = datetime.now().isoformat()
-
-            # 6. Добавляем заново
-            self.collection.add(
-                documents=[document],
-                embeddings=[old_embedding],
-                metadatas=[updated_metadata],
-                ids=[doc_id]
-            )
-
-            logger.info(f"[OK] Обновлено по эмбеддингу: {doc_id}")
+            # 2. Дальше — как по ID (отложенная запись)
+            self.update_memory_usage_by_id(result['ids'][0][0])
 
         except Exception as e:
             logger.exception(f"[ERROR] Ошибка при обновлении документа: {e}")
@@ -599,7 +688,7 @@ class PersonaEmbeddingPipeline:
         """
         try:
             # Получаем все данные
-            results = self.collection.get(include=["documents", "metadatas", "embeddings"],
+            results = self.collection.get(include=["documents", "metadatas"],
                                           where={"account_id": account_id})
             # Важно: "пусто" — это нормальный сценарий (у пользователя ещё нет воспоминаний).
             # Не считаем это ошибкой, чтобы API мог вернуть 200 + [] вместо 500.
@@ -688,27 +777,47 @@ class PersonaEmbeddingPipeline:
             # Проверяем, существует ли запись
             results = self.collection.get(
                 ids=[record_id],
-                include=["metadatas"],
+                include=["documents", "metadatas"],
                 where={"account_id": account_id}
             )
             if not results["ids"]:
                 logger.warning(f"Запись {record_id} не найдена для account_id={account_id}")
                 raise ValueError(f"Запись {record_id} не найдена для account_id={account_id}")
 
-            # Удаляем старую запись
-            self.collection.delete(ids=[record_id])
-
-            # Генерируем новый эмбеддинг
-            embedding = EmbeddingManager.get_embedding(text).tolist()
-
             # Обновляем метаданные, сохраняя account_id
-            updated_metadata = metadata or {}
+            updated_metadata = dict(metadata or {})
             if "account_id" not in updated_metadata:
                 updated_metadata["account_id"] = account_id
                 logger.debug(f"Добавлен account_id={account_id} в метаданные")
 
-            # Добавляем обновлённую запись
-            self.collection.add(
+            # last_used не передан — сохраняем обращение из записи, иначе
+            # воспоминание снова попадёт в поиск как давно не использованное
+            old_metadata = results["metadatas"][0] or {}
+            if "last_used" not in updated_metadata:
+                for key in ("last_used", "last_used_ts"):
+                    if key in old_metadata:
+                        updated_metadata[key] = old_metadata[key]
+            updated_metadata = with_last_used_ts(updated_metadata)
+
+            # update/upsert в Chroma сливают ключи: убранные вызывающим
+            # удаляем явно (None), чтобы метаданные заменялись целиком
+            for key in old_metadata.keys() - updated_metadata.keys():
+                updated_metadata[key] = None
+
+            # Текст не изменился — меняем только метаданные, вектор не трогаем
+            if results["documents"][0] == text:
+                self.collection.update(
+                    ids=[record_id],
+                    metadatas=[updated_metadata],
+                )
+                logger.info(f"Метаданные записи {record_id} обновлены для account_id={account_id}")
+                return
+
+            # Генерируем новый эмбеддинг
+            embedding = get_or_compute_one(text).tolist()
+
+            # Перезаписываем запись одним вызовом (вместо delete + add)
+            self.collection.upsert(
                 documents=[text],
                 embeddings=[embedding],
                 metadatas=[updated_metadata],
@@ -11,36 +11,80 @@
 # MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
 # GNU Affero General Public License for more details.
 
-from infrastructure.vector_store.embedding_pipeline import PersonaEmbeddingPipeline
+from typing import Optional
+
+from infrastructure.logging.logger import setup_logger
+from infrastructure.vector_store.embedding_pipeline import PersonaEmbeddingPipeline, with_last_used_ts
+from settings import settings
+
+logger = setup_logger("chroma_migrations")
+
+# Маркер завершённого бэкфилла last_used_ts: новые записи пишутся уже с полем,
+# так что после первого успешного прохода полный collection.get на старте не нужен
+LAST_USED_TS_MARKER = settings.VECTOR_STORE_DIR / ".last_used_ts_migrated"
+
+
+def _update_metadatas(pipeline: PersonaEmbeddingPipeline, ids: list[str], metadatas: list[dict]) -> None:
+    """collection.update кусками по max_batch_size клиента: большие коллекции не влезают в один вызов."""
+    batch_size = pipeline.client.get_max_batch_size()
+    for start in range(0, len(ids), batch_size):
+        pipeline.collection.update(
+            ids=ids[start:start + batch_size],
+            metadatas=metadatas[start:start + batch_size],
+        )
 
 
 def migrate_account_id(pipeline: PersonaEmbeddingPipeline, default_account_id: str) -> None:
     """Добавляет account_id в метаданные существующих записей."""
     try:
         #Получаем все записи (без фильтра по account_id)
-        results = pipeline.collection.get(include=["documents", "metadatas", "embeddings"])
+        results = pipeline.collection.get(include=["metadatas"])
         if not results["ids"]:
             print("Коллекция пуста, миграция не требуется")
             return
-        for doc_id, doc, metadata, embedding in zip(
-            results["ids"], results["documents"], results["metadatas"], results["embeddings"]
-            ):
-            if "account_id" not in metadata:
-            #Удаляем старую запись
-                pipeline.collection.delete(ids=[doc_id])
-                #Обновляем метаданные
+        ids, metadatas = [], []
+        for doc_id, metadata in zip(results["ids"], results["metadatas"]):
+            if metadata is not None and "account_id" not in metadata:
                 metadata["account_id"] = default_account_id
-                #Добавляем запись заново
-                pipeline.collection.add(
-                documents=[doc],
-                embeddings=[embedding],
-                metadatas=[metadata],
-                ids=[doc_id]
-                )
-                print(f"Обновлена запись {doc_id} с account_id={default_account_id}")
+                ids.append(doc_id)
+                metadatas.append(metadata)
+
+        if ids:
+            # Пачки update вместо delete + add на каждый документ:
+            # эмбеддинги и тексты не меняются, HNSW не перестраивается
+            _update_metadatas(pipeline, ids, metadatas)
+            print(f"Обновлено записей: {len(ids)} с account_id={default_account_id}")
     except Exception as e:
         print(f"Ошибка при миграции: {str(e)}")
 
+def migrate_last_used_ts(pipeline: Optional[PersonaEmbeddingPipeline] = None) -> int:
+    """
+    Дописывает числовой last_used_ts в метаданные записей, где его нет.
+
+    query_similar фильтрует недавно использованные воспоминания в where
+    Chroma по last_used_ts; записи без поля туда не попадут. Идемпотентна,
+    вызывается на старте приложения; после успешного прохода оставляет
+    LAST_USED_TS_MARKER и больше коллекцию не читает. Возвращает число
+    обновлённых записей.
+    """
+    if LAST_USED_TS_MARKER.exists():
+        return 0
+    pipeline = pipeline or PersonaEmbeddingPipeline()
+    results = pipeline.collection.get(include=["metadatas"])
+    ids, metadatas = [], []
+    for doc_id, metadata in zip(results["ids"], results["metadatas"]):
+        if metadata is not None and "last_used_ts" not in metadata:
+            ids.append(doc_id)
+            metadatas.append(with_last_used_ts(dict(metadata)))
+
+    if ids:
+        # Метаданные меняются на месте, эмбеддинги не трогаем
+        _update_metadatas(pipeline, ids, metadatas)
+        logger.info("[MIGRATION] last_used_ts добавлен в %d записей", len(ids))
+    LAST_USED_TS_MARKER.parent.mkdir(parents=True, exist_ok=True)
+    LAST_USED_TS_MARKER.touch()
+    return len(ids)
+
 if __name__ == "__main__":
     # Migration script - требует явный account_id
     import sys
@@ -16,9 +16,9 @@
 import asyncio
 import base64
 import json
-import traceback
-from typing import Optional, Union, Dict, Any
+import logging
 from logging import Logger
+from typing import Optional, Union, Dict, Any
 
 import aiohttp
 
@@ -136,15 +136,15 @@ class VisionClient:
         Raises:
             Exception: При исчерпании всех попыток retry
         """
-        self.logger.info(f"[VISION] Начало анализа изображения")
+        self.logger.info("[VISION] Начало анализа изображения")
         
         # Определяем тип изображения и кодируем если нужно
         if isinstance(image, bytes):
             image_data = self.encode_image_bytes(image, mime_type)
-            self.logger.debug(f"[VISION] Изображение закодировано в base64 ({len(image)} bytes)")
+            self.logger.debug("[VISION] Изображение закодировано в base64 (%d bytes)", len(image))
         else:
             image_data = self.encode_image_url(image)
-            self.logger.debug(f"[VISION] Используется URL изображения: {image[:100]}")
+            self.logger.debug("[VISION] Используется URL изображения: %s", image[:100])
         
         # Формируем сообщения
         messages = []
@@ -185,7 +185,7 @@ class VisionClient:
             if retry > 0:
                 import random
                 wait_time = min(2 ** retry + random.uniform(0, 1), 30)  # max 30 секунд
-                self.logger.info(f"[VISION][RETRY] Ждём {wait_time:.2f}s перед попыткой {retry + 1}/{self.max_retries}")
+                self.logger.info("[VISION][RETRY] Ждём %.2fs перед попыткой %d/%d", wait_time, retry + 1, self.max_retries)
                 await asyncio.sleep(wait_time)
             
             try:
@@ -193,7 +193,7 @@ class VisionClient:
                 retry_timeout = aiohttp.ClientTimeout(total=self.timeout + (retry * 20))
                 
                 async with aiohttp.ClientSession() as session:
-                    self.logger.info(f"[VISION] Отправка запроса к {self.api_url}, попытка {retry + 1}/{self.max_retries}")
+                    self.logger.info("[VISION] Отправка запроса к %s, попытка %d/%d", self.api_url, retry + 1, self.max_retries)
                     
                     resp = await session.post(
                         self.api_url,
@@ -202,12 +202,12 @@ class VisionClient:
                         timeout=retry_timeout,
                     )
                     
-                    self.logger.info(f"[VISION] Статус ответа API: {resp.status}")
+                    self.logger.info("[VISION] Статус ответа API: %s", resp.status)
                     
                     # Обработка статусов, требующих retry
                     if resp.status in [429, 500, 502, 503, 504]:
                         error_text = await resp.text()
-                        self.logger.warning(f"[VISION][WARN] Статус {resp.status}, retry доступен: {error_text[:200]}")
+                        self.logger.warning("[VISION][WARN] Статус %s, retry доступен: %s", resp.status, error_text[:200])
                         if retry < self.max_retries - 1:
                             continue  # Пробуем снова
                         else:
@@ -215,11 +215,11 @@ class VisionClient:
                     
                     if resp.status != 200:
                         error_text = await resp.text()
-                        self.logger.error(f"[VISION][ERROR] Статус {resp.status}: {error_text[:500]}")
+                        self.logger.error("[VISION][ERROR] Статус %s: %s", resp.status, error_text[:500])
                         raise Exception(f"API вернул статус {resp.status}: {error_text[:500]}")
                     
                     data = await resp.json()
-                    self.logger.debug(f"[VISION] Ответ API получен успешно")
+                    self.logger.debug("[VISION] Ответ API получен успешно")
                 
                 # Извлекаем контент из ответа
                 if not data.get("choices"):
@@ -231,13 +231,13 @@ class VisionClient:
                     raise Exception("Некорректная структура ответа: отсутствует message или content")
                 
                 raw_content = data["choices"][0]["message"]["content"]
-                self.logger.info(f"[VISION] Анализ успешно завершен, длина ответа: {len(raw_content)} символов")
-                self.logger.debug(f"[VISION] RAW response: {raw_content[:200]}...")
+                self.logger.info("[VISION] Анализ успешно завершен, длина ответа: %d символов", len(raw_content))
+                self.logger.debug("[VISION] RAW response: %s...", raw_content[:200])
                 
                 # Извлекаем usage для трекинга
                 usage_data = data.get("usage", {})
                 if usage_data:
-                    self.logger.debug(f"[VISION] Usage данные: {usage_data}")
+                    self.logger.debug("[VISION] Usage данные: %s", usage_data)
                 
                 return {
                     "content": raw_content,
@@ -248,79 +248,99 @@ class VisionClient:
             # === SSL ОШИБКИ ===
             except aiohttp.ClientSSLError as e:
                 last_exception = e
-                self.logger.error(f"[VISION][ERROR] SSL Error (попытка {retry + 1}/{self.max_retries}): {e}")
-                self.logger.debug(f"[VISION][DEBUG] SSL Traceback: {traceback.format_exc()}")
+                self.logger.error(
+                    "[VISION][ERROR] SSL Error (попытка %d/%d): %s",
+                    retry + 1, self.max_retries, e,
+                    exc_info=self.logger.isEnabledFor(logging.DEBUG),
+                )
                 if retry < self.max_retries - 1:
                     continue
                     
             # === CONNECTION ОШИБКИ (включая DNS, connection refused, etc.) ===
             except aiohttp.ClientConnectorError as e:
                 last_exception = e
-                self.logger.error(f"[VISION][ERROR] Connection Error (попытка {retry + 1}/{self.max_retries}): {e}")
-                self.logger.debug(f"[VISION][DEBUG] Connection details: host={getattr(e, 'host', 'N/A')}, port={getattr(e, 'port', 'N/A')}")
-                self.logger.debug(f"[VISION][DEBUG] Traceback: {traceback.format_exc()}")
+                self.logger.error(
+                    "[VISION][ERROR] Connection Error (попытка %d/%d): %s",
+                    retry + 1, self.max_retries, e,
+                    exc_info=self.logger.isEnabledFor(logging.DEBUG),
+                )
+                self.logger.debug("[VISION][DEBUG] Connection details: host=%s, port=%s",
+                                  getattr(e, "host", "N/A"), getattr(e, "port", "N/A"))
                 if retry < self.max_retries - 1:
                     continue
                     
             # === SERVER DISCONNECTED ===
             except aiohttp.ServerDisconnectedError as e:
                 last_exception = e
-                self.logger.error(f"[VISION][ERROR] Server Disconnected (попытка {retry + 1}/{self.max_retries}): {e}")
-                self.logger.debug(f"[VISION][DEBUG] Traceback: {traceback.format_exc()}")
+                self.logger.error(
+                    "[VISION][ERROR] Server Disconnected (попытка %d/%d): %s",
+                    retry + 1, self.max_retries, e,
+                    exc_info=self.logger.isEnabledFor(logging.DEBUG),
+                )
                 if retry < self.max_retries - 1:
                     continue
                     
             # === CLIENT CONNECTION ERROR ===
             except aiohttp.ClientConnectionError as e:
                 last_exception = e
-                self.logger.error(f"[VISION][ERROR] Client Connection Error (попытка {retry + 1}/{self.max_retries}): {e}")
-                self.logger.debug(f"[VISION][DEBUG] Traceback: {traceback.format_exc()}")
+                self.logger.error(
+                    "[VISION][ERROR] Client Connection Error (попытка %d/%d): %s",
+                    retry + 1, self.max_retries, e,
+                    exc_info=self.logger.isEnabledFor(logging.DEBUG),
+                )
                 if retry < self.max_retries - 1:
                     continue
 
             # === HTTP RESPONSE ERROR (429, 500, etc.) ===
             except aiohttp.ClientResponseError as e:
                 last_exception = e
-                self.logger.error(f"[VISION][ERROR] ClientResponseError (попытка {retry + 1}/{self.max_retries}): {e}")
+                self.logger.error("[VISION][ERROR] ClientResponseError (попытка %d/%d): %s", retry + 1, self.max_retries, e)
                 error_body = await e.response.text() if hasattr(e, "response") else "No response body"
-                self.logger.error(f"[VISION][DEBUG] Тело ответа: {error_body[:500]}")
+                self.logger.error("[VISION][DEBUG] Тело ответа: %s", error_body[:500])
                 if e.status in [429, 500, 502, 503, 504] and retry < self.max_retries - 1:
                     continue
 
             # === TIMEOUT ===
             except asyncio.TimeoutError as e:
                 last_exception = e
-                self.logger.error(f"[VISION][ERROR] Timeout (попытка {retry + 1}/{self.max_retries}): {e}")
-                self.logger.debug(f"[VISION][DEBUG] Traceback: {traceback.format_exc()}")
+                self.logger.error(
+                    "[VISION][ERROR] Timeout (попытка %d/%d): %s",
+                    retry + 1, self.max_retries, e,
+                    exc_info=self.logger.isEnabledFor(logging.DEBUG),
+                )
                 if retry < self.max_retries - 1:
                     continue
 
             # === OS ERROR (network unreachable, etc.) ===
             except OSError as e:
                 last_exception = e
-                self.logger.error(f"[VISION][ERROR] OS Error (попытка {retry + 1}/{self.max_retries}): {e}")
-                self.logger.debug(f"[VISION][DEBUG] Errno: {e.errno}, Traceback: {traceback.format_exc()}")
+                self.logger.error(
+                    "[VISION][ERROR] OS Error (попытка %d/%d): errno=%s %s",
+                    retry + 1, self.max_retries, e.errno, e,
+                    exc_info=self.logger.isEnabledFor(logging.DEBUG),
+                )
                 if retry < self.max_retries - 1:
                     continue
                     
             # === JSON DECODE ERROR ===
             except json.JSONDecodeError as e:
                 last_exception = e
-                self.logger.error(f"[VISION][ERROR] JSON Decode Error: {e}")
-                self.logger.debug(f"[VISION][DEBUG] Traceback: {traceback.format_exc()}")
+                self.logger.error(
+                    "[VISION][ERROR] JSON Decode Error: %s", e,
+                    exc_info=self.logger.isEnabledFor(logging.DEBUG),
+                )
                 # JSON errors не retry-им, сразу выбрасываем
                 raise
 
             # === ВСЕ ОСТАЛЬНЫЕ ОШИБКИ ===
             except Exception as e:
                 last_exception = e
-                self.logger.error(f"[VISION][ERROR] Неожиданная ошибка (попытка {retry + 1}/{self.max_retries}): {type(e).__name__}: {e}")
-                self.logger.debug(f"[VISION][DEBUG] Traceback: {traceback.format_exc()}")
+                self.logger.exception("[VISION][ERROR] Неожиданная ошибка (попытка %d/%d): %s: %s", retry + 1, self.max_retries, type(e).__name__, e)
                 if retry < self.max_retries - 1:
                     continue
         
         # Если дошли сюда - все попытки провалились
-        self.logger.error(f"[VISION][ERROR] Все {self.max_retries} попытки провалились")
+        self.logger.error("[VISION][ERROR] Все %d попытки провалились", self.max_retries)
         if last_exception:
             raise Exception(f"Vision API недоступен после {self.max_retries} попыток. Последняя ошибка: {type(last_exception).__name__}: {str(last_exception)}") from last_exception
         else:
@@ -364,10 +384,10 @@ class VisionClient:
         # Парсим JSON из контента
         try:
             parsed = json.loads(result["content"])
-            self.logger.info(f"[VISION] JSON успешно распарсен")
+            self.logger.info("[VISION] JSON успешно распарсен")
             return parsed
         except json.JSONDecodeError as e:
-            self.logger.error(f"[VISION] Ошибка парсинга JSON: {e}")
-            self.logger.error(f"[VISION] Контент: {result['content']}")
+            self.logger.error("[VISION] Ошибка парсинга JSON: %s", e)
+            self.logger.error("[VISION] Контент: %s", result['content'])
             raise
 
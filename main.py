@@ -46,8 +46,14 @@ from api import (
 from infrastructure.context_store.session_context_store import SessionContextStore
 from infrastructure.database import Database
 from infrastructure.embeddings.runner import preload_models
+from infrastructure.llm.client import close_shared_session, prewarm_shared_session
+from infrastructure.llm.usage import usage_writer_worker
 from infrastructure.logging.logger import setup_logger
-from infrastructure.pushi.reminders_sender import check_and_send_reminders_pushi
+from infrastructure.pushi.push_notifications import close_pushy_session
+from infrastructure.pushi.reminders_sender import run_reminders_scheduler
+from infrastructure.utils.threading_tools import run_in_executor
+from infrastructure.vector_store.embedding_pipeline import flush_memory_usage
+from infrastructure.vector_store.migrations import migrate_last_used_ts
 from settings import settings
 
 logger = setup_logger("assistant")
@@ -72,6 +78,18 @@ async def lifespan(app: FastAPI):
         # Не падаем целиком, но логируем стек
         app.state.logger.exception("[startup] Ошибка при предзагрузке моделей")
 
+    # Chroma: числовой last_used_ts для фильтра в query_similar (идемпотентно)
+    try:
+        await run_in_executor(migrate_last_used_ts)
+    except Exception:
+        app.state.logger.exception("[startup] Ошибка миграции last_used_ts в Chroma")
+
+    # Прогрев соединений к LLM-провайдерам (в фоне, не блокирует старт)
+    app.state.llm_prewarm_task = asyncio.create_task(prewarm_shared_session())
+
+    # Пакетная запись usage LLM в БД (вне пути ответа)
+    app.state.usage_writer_task = asyncio.create_task(usage_writer_worker())
+
     # Старт фонового воркера напоминаний
     app.state.reminders_task = asyncio.create_task(_reminders_worker())
 
@@ -84,7 +102,8 @@ async def lifespan(app: FastAPI):
     yield
 
     # Shutdown: останавливаем фоновые задачи
-    for task_name in ("reminders_task", "reflection_task", "scheduled_push_task"):
+    for task_name in ("llm_prewarm_task", "reminders_task", "reflection_task", "scheduled_push_task",
+                      "usage_writer_task"):
         task = getattr(app.state, task_name, None)
         if task:
             task.cancel()
@@ -93,6 +112,14 @@ async def lifespan(app: FastAPI):
             except asyncio.CancelledError:
                 pass
     
+    # Дописываем отложенные обращения к воспоминаниям (frequency/last_used)
+    await run_in_executor(flush_memory_usage)
+
+    # Cleanup: закрываем общий HTTP-пул LLM-клиента
+    await close_shared_session()
+    await close_pushy_session()
+    app.state.logger.info("[shutdown] LLM/Pushy HTTP sessions closed")
+
     # Cleanup: dispose database connection pool
     if hasattr(app.state, "db"):
         app.state.db.dispose()
@@ -154,18 +181,12 @@ async def _reminders_worker() -> None:
     """
     Фоновый воркер для отправки напоминаний.
 
-    Каждую минуту:
-    - вызывает check_and_send_reminders_pushi(), который находит
-      просроченные/активные напоминания и отправляет пуши;
-    - логирует все ошибки, но не останавливает цикл.
+    Запускает планировщик run_reminders_scheduler(): он просыпается к сроку
+    ближайшего напоминания, на границе минуты (будильники) или по сигналу
+    об изменении напоминаний; ошибки логирует, но не останавливает цикл.
     """
     logger.info("[reminders] Старт фонового воркера напоминаний")
-    while True:
-        try:
-            check_and_send_reminders_pushi()
-        except Exception:
-            logger.exception("[reminders] Ошибка в воркере отправки напоминаний")
-        await asyncio.sleep(60)
+    await run_reminders_scheduler()
 
 
 # ---------- Reflection (Autonomy) ----------
@@ -387,7 +408,7 @@ async def _scheduled_push_worker() -> None:
     from datetime import datetime, timedelta
     from infrastructure.database.repositories.task_repository import TaskRepository
     from infrastructure.database.models import VictorTask, VictorTaskTrigger, VictorTaskStatus
-    from infrastructure.pushi.push_notifications import send_pushy_notification
+    from infrastructure.pushi.push_notifications import PushMessage, send_pushy_batch
     from infrastructure.firebase.tokens import get_user_tokens
 
     logger.info("[scheduled_push] Старт воркера отложенных пушей")
@@ -516,21 +537,19 @@ async def _scheduled_push_worker() -> None:
 
                     tokens = get_user_tokens(creator_id)
                     if tokens:
-                        for token in tokens:
-                            try:
-                                send_pushy_notification(
-                                    token=token,
-                                    title="Victor",
-                                    body=final_text[:200],
-                                    data={
-                                        "type": "scheduled_message",
-                                        "account_id": creator_id,
-                                        "text": final_text,
-                                        "task_id": str(task_id),
-                                    },
-                                )
-                            except Exception as e:
-                                logger.warning(f"[scheduled_push] Ошибка отправки пуша: {e}")
+                        data = {
+                            "type": "scheduled_message",
+                            "account_id": creator_id,
+                            "text": final_text,
+                            "task_id": str(task_id),
+                        }
+                        try:
+                            await send_pushy_batch([
+                                PushMessage(token, "Victor", final_text[:200], data)
+                                for token in tokens
+                            ])
+                        except Exception as e:
+                            logger.warning(f"[scheduled_push] Ошибка отправки пуша: {e}")
 
                         logger.info(f"[scheduled_push] Задача #{task_id} отправлена ({len(tokens)} токенов)")
                     else:
@@ -2,7 +2,7 @@ import asyncio
 
 from infrastructure.firebase.tokens import get_user_tokens
 from infrastructure.logging.logger import setup_logger
-from infrastructure.pushi.push_notifications import send_pushy_notification
+from infrastructure.pushi.push_notifications import send_pushy_notification_async
 from tools.reminders.reminder_chain import ReminderChain
 logger = setup_logger("reminders")
 
@@ -21,8 +21,8 @@ async def reminder(account_id: str, text: str) -> str:
 if __name__ == "__main__":
     token = get_user_tokens("test_user")
     alarm_time = "0:44"
-    send_pushy_notification(
-        token=token,
+    asyncio.run(send_pushy_notification_async(
+        to=token,
         title="Доброе утро, Олечка ♡",
         body="Включил тебе музыку~",
         data={
@@ -31,4 +31,4 @@ if __name__ == "__main__":
             "action": "RING_LOUD_PLS",
             "alarm_time": alarm_time
         }
-    )
\ No newline at end of file
+    ))
\ No newline at end of file
@@ -0,0 +1,45 @@
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from infrastructure.embeddings import embedding_cache
+from infrastructure.embeddings.embedding_cache import EmbeddingCache, get_or_compute
+from infrastructure.embeddings.embedding_manager import EmbeddingManager
+
+
+class _FakeModel:
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, texts, **kwargs):
+        self.encoded.extend(texts)
+        return np.array([[float(len(t)), 1.0] for t in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def model(tmp_path, monkeypatch):
+    fake = _FakeModel()
+    monkeypatch.setattr(embedding_cache, "_cache", EmbeddingCache(db_path=tmp_path / "emb.sqlite"))
+    monkeypatch.setattr(EmbeddingManager, "_embedding_cache", OrderedDict())
+    monkeypatch.setattr(EmbeddingManager, "get_embedding_model", classmethod(lambda cls: fake))
+    return fake
+
+
+def test_get_or_compute_encodes_each_text_once(model):
+    first = get_or_compute(["Привет", "мир", "привет "])
+
+    assert model.encoded == ["привет", "мир"]
+    assert np.array_equal(first[0], first[2])
+    assert list(EmbeddingManager._embedding_cache) == ["привет", "мир"]
+
+
+def test_get_or_compute_reads_sqlite_behind_memory_tier(model):
+    get_or_compute(["привет"])
+    EmbeddingManager._embedding_cache.clear()  # как после рестарта процесса
+
+    again = get_or_compute(["привет"])
+
+    assert model.encoded == ["привет"]
+    assert again.shape == (1, 2)
+    assert "привет" in EmbeddingManager._embedding_cache
@@ -0,0 +1,50 @@
+from collections import OrderedDict
+
+import pytest
+
+from infrastructure.firebase import tokens
+
+
+@pytest.fixture
+def token_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(tokens, "TOKENS_DB", tmp_path / "tokens.sqlite")
+    monkeypatch.setattr(tokens, "LEGACY_TOKENS_FILE", tmp_path / "tokens.json")
+    monkeypatch.setattr(tokens, "_conn", None)
+    monkeypatch.setattr(tokens, "_tokens_cache", OrderedDict())
+    return tokens
+
+
+def test_get_tokens_for_accounts_groups_by_user(token_store):
+    token_store.save_device_token("alice", "t1")
+    token_store.save_device_token("alice", "t2")
+    token_store.save_device_token("bob", "t3")
+
+    result = token_store.get_tokens_for_accounts(["alice", "bob", "carol", "alice"])
+
+    assert sorted(result["alice"]) == ["t1", "t2"]
+    assert result["bob"] == ["t3"]
+    assert "carol" not in result
+    assert token_store.get_tokens_for_accounts([]) == {}
+
+
+def test_user_tokens_cache_is_invalidated_on_save_and_remove(token_store):
+    token_store.save_device_token("alice", "t1")
+    assert token_store.get_user_tokens("alice") == ["t1"]
+
+    token_store.save_device_token("alice", "t2")
+    assert sorted(token_store.get_user_tokens("alice")) == ["t1", "t2"]
+
+    token_store.remove_device_token("alice", "t1")
+    assert token_store.get_tokens_for_accounts(["alice"]) == {"alice": ["t2"]}
+
+
+def test_get_tokens_for_accounts_chunks_in_query_and_caps_cache(token_store, monkeypatch):
+    monkeypatch.setattr(token_store, "_IN_CHUNK", 2)
+    monkeypatch.setattr(token_store, "TOKENS_CACHE_MAX_SIZE", 3)
+    for i in range(5):
+        token_store.save_device_token(f"user{i}", f"t{i}")
+
+    result = token_store.get_tokens_for_accounts(f"user{i}" for i in range(5))
+
+    assert result == {f"user{i}": [f"t{i}"] for i in range(5)}
+    assert len(token_store._tokens_cache) == 3
@@ -0,0 +1,18 @@
+from infrastructure.llm.circuit_breaker import CircuitBreaker
+
+
+def test_breaker_opens_after_fail_max_and_rejects_calls():
+    breaker = CircuitBreaker(fail_max=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+
+
+def test_breaker_lets_trial_call_through_and_closes_on_success():
+    breaker = CircuitBreaker(fail_max=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.is_open
+    assert breaker.allow()  # пробный запрос после reset_timeout
+    breaker.record_success()
+    assert not breaker.is_open
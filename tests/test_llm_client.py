@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from infrastructure.llm import client as llm_client
+from infrastructure.llm.client import LLMClient
+from infrastructure.llm.response_cache import ResponseCache
+
+
+@pytest.mark.parametrize("mode", ["creative", "advanced", "foundation"])
+def test_llm_client_constructs_for_every_mode(mode):
+    client = LLMClient(account_id="acc", mode=mode)
+    assert client.model_name == client.mode_config[mode]["model"]
+    assert client._headers["Accept-Encoding"].startswith("gzip")
+    assert client._stream_headers["Accept"] == "text/event-stream"
+
+
+def test_llm_client_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        LLMClient(account_id="acc", mode="unknown")
+
+
+def _count_requests(monkeypatch, temperature):
+    monkeypatch.setattr(llm_client, "_response_cache", ResponseCache())
+    calls = []
+
+    async def fake_send_request(self, json_payload):
+        calls.append(json_payload)
+        return {"assistant_response": f"ответ {len(calls)}", "usage": {"prompt_tokens": 1}}
+
+    monkeypatch.setattr(LLMClient, "_send_request", fake_send_request)
+    client = LLMClient(account_id="acc")
+
+    async def ask_twice():
+        for _ in range(2):
+            await client.get_response("system", "context", new_message="привет", temperature=temperature)
+
+    asyncio.run(ask_twice())
+    return len(calls)
+
+
+def test_get_response_caches_only_deterministic_requests(monkeypatch):
+    assert _count_requests(monkeypatch, temperature=0) == 1
+    assert _count_requests(monkeypatch, temperature=0.3) == 2
+
+
+def test_semantic_segment_separates_accounts_and_conversations():
+    alice, bob = LLMClient(account_id="alice"), LLMClient(account_id="bob")
+    history = ["user: привет"]
+    assert alice._semantic_segment("system", history) == alice._semantic_segment("system", list(history))
+    assert alice._semantic_segment("system", history) != bob._semantic_segment("system", history)
+    assert alice._semantic_segment("system", history) != alice._semantic_segment("другая персона", history)
+    assert alice._semantic_segment("system", history) != alice._semantic_segment("system", [])
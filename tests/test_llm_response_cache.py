@@ -0,0 +1,42 @@
+from infrastructure.llm.response_cache import ResponseCache, make_cache_key
+
+
+def test_make_cache_key_ignores_key_order():
+    a = {"model": "m", "temperature": 0, "messages": [{"role": "user", "content": "hi"}]}
+    b = {"messages": [{"role": "user", "content": "hi"}], "temperature": 0, "model": "m"}
+    assert make_cache_key(a) == make_cache_key(b)
+
+
+def test_response_cache_survives_restart_via_sqlite(tmp_path):
+    db = tmp_path / "llm_cache.sqlite"
+    value = {"assistant_response": "ответ", "usage": {"prompt_tokens": 3}}
+
+    ResponseCache(db_path=db).set("k", value)
+
+    # Новый экземпляр — пустой L1, значение приходит из L2
+    assert ResponseCache(db_path=db).get("k") == value
+
+
+def test_response_cache_expires_entries(tmp_path):
+    cache = ResponseCache(db_path=tmp_path / "llm_cache.sqlite")
+    cache.set("k", {"assistant_response": "x", "usage": {}}, ttl=-1)
+    assert cache.get("k") is None
+
+
+def test_response_cache_memory_is_lru_bounded():
+    cache = ResponseCache(maxsize=2)
+    for key in ("a", "b", "c"):
+        cache.set(key, {"assistant_response": key, "usage": {}})
+    assert cache.get("a") is None
+    assert cache.get("c") == {"assistant_response": "c", "usage": {}}
+
+
+def test_response_cache_prunes_expired_rows_from_sqlite(tmp_path):
+    db = tmp_path / "llm_cache.sqlite"
+    cache = ResponseCache(db_path=db)
+    cache.PRUNE_EVERY = 2
+    cache.set("old", {"assistant_response": "x", "usage": {}}, ttl=-1)
+    cache.set("new", {"assistant_response": "y", "usage": {}})
+
+    keys = [row[0] for row in cache._get_conn().execute("SELECT key FROM llm_cache")]
+    assert keys == ["new"]
@@ -0,0 +1,19 @@
+import numpy as np
+
+from infrastructure.llm.semantic_cache import SemanticResponseCache
+
+
+def test_semantic_cache_hits_only_within_segment():
+    cache = SemanticResponseCache(threshold=0.9)
+    value = {"assistant_response": "ответ", "usage": {}}
+    cache.set("a", np.array([1.0, 0.0]), value)
+    assert cache.get("a", np.array([0.99, 0.05])) == value
+    assert cache.get("b", np.array([1.0, 0.0])) is None
+
+
+def test_semantic_cache_evicts_least_recent_segment():
+    cache = SemanticResponseCache(max_segments=2)
+    for segment in ("a", "b", "c"):
+        cache.set(segment, np.array([1.0, 0.0]), {"assistant_response": segment, "usage": {}})
+    assert cache.get("a", np.array([1.0, 0.0])) is None
+    assert cache.get("c", np.array([1.0, 0.0]))["assistant_response"] == "c"
@@ -0,0 +1,34 @@
+import asyncio
+import threading
+
+from infrastructure.llm import usage
+
+
+def test_usage_writer_does_not_rewrite_batch_cancelled_mid_flush(monkeypatch):
+    written = []
+    started, release, done = threading.Event(), threading.Event(), threading.Event()
+
+    def slow_batch_write(events):
+        started.set()
+        release.wait(timeout=5)
+        written.append(list(events))
+        done.set()
+
+    monkeypatch.setattr(usage, "update_model_usage_batch", slow_batch_write)
+    monkeypatch.setattr(usage, "_USAGE_FLUSH_INTERVAL", 0)
+
+    async def scenario():
+        worker = asyncio.create_task(usage.usage_writer_worker())
+        await asyncio.sleep(0)
+        await usage._save_usage("acc", "model", "provider", 10, 5)
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        worker.cancel()
+        release.set()
+        try:
+            await worker
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(scenario())
+    done.wait(timeout=5)
+    assert written == [[("acc", "model", "provider", 10, 5)]]
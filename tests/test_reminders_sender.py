@@ -0,0 +1,71 @@
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from infrastructure.pushi import reminders_sender
+
+
+class _FakeSession:
+    def __init__(self, reminders, fail_commit=False):
+        self._reminders = reminders
+        self._fail_commit = fail_commit
+        self.executed = []
+        self.committed = False
+
+    def scalars(self, statement):
+        rows, self._reminders = self._reminders, []
+        return SimpleNamespace(all=lambda: rows)
+
+    def execute(self, statement, params=None):
+        self.executed.append((statement, params))
+
+    def commit(self):
+        if self._fail_commit:
+            raise RuntimeError("commit failed")
+        self.committed = True
+
+
+def _reminder(account_id, when, repeat_weekly=False):
+    return SimpleNamespace(
+        id=uuid.uuid4(), account_id=account_id, title="Позвонить", text="маме",
+        datetime=when, repeat_weekly=repeat_weekly,
+    )
+
+
+@pytest.fixture
+def tokens(monkeypatch):
+    monkeypatch.setattr(
+        reminders_sender, "get_tokens_for_accounts",
+        lambda account_ids: {"alice": ["t1", "t2"]},
+    )
+
+
+def test_process_due_reminders_updates_by_primary_key(tokens):
+    now = datetime(2026, 10, 17, 12, 0)
+    once = _reminder("alice", now - timedelta(minutes=1))
+    weekly = _reminder("alice", now - timedelta(minutes=5), repeat_weekly=True)
+    no_tokens = _reminder("bob", now - timedelta(minutes=2))
+    session = _FakeSession([once, weekly, no_tokens])
+    outbox = []
+
+    assert reminders_sender.process_due_reminders(session, now, outbox) == 2
+
+    [(statement, params)] = session.executed
+    assert "WHERE reminders.id = " in str(statement)
+    assert {p["b_id"]: p["b_done"] for p in params} == {once.id: True, weekly.id: False}
+    assert next(p for p in params if p["b_id"] == weekly.id)["b_datetime"] > now
+    assert session.committed
+    assert len(outbox) == 4  # два напоминания alice × два токена
+    assert {m.data["reminder_id"] for m in outbox} == {str(once.id), str(weekly.id)}
+
+
+def test_process_due_reminders_sends_nothing_if_commit_fails(tokens):
+    now = datetime(2026, 10, 17, 12, 0)
+    session = _FakeSession([_reminder("alice", now)], fail_commit=True)
+    outbox = []
+
+    with pytest.raises(RuntimeError):
+        reminders_sender.process_due_reminders(session, now, outbox)
+    assert outbox == []
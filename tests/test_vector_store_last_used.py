@@ -0,0 +1,80 @@
+import uuid
+from datetime import datetime, timedelta
+
+import chromadb
+import pytest
+
+from infrastructure.vector_store.embedding_pipeline import PersonaEmbeddingPipeline, _UsageWriteBack
+from infrastructure.vector_store import migrations
+from infrastructure.vector_store.migrations import migrate_last_used_ts
+
+
+@pytest.fixture
+def pipeline():
+    client = chromadb.EphemeralClient()
+    collection = client.get_or_create_collection(name=f"test_{uuid.uuid4().hex}")
+    yield PersonaEmbeddingPipeline(client=client, collection=collection)
+    client.delete_collection(collection.name)
+
+
+def _add(pipeline, doc_id, embedding, **metadata):
+    pipeline.collection.add(
+        ids=[doc_id],
+        documents=[doc_id],
+        embeddings=[embedding],
+        metadatas=[{"account_id": "acc", **metadata}],
+    )
+
+
+def test_migrate_last_used_ts_backfills_in_batches(pipeline, monkeypatch, tmp_path):
+    monkeypatch.setattr(migrations, "LAST_USED_TS_MARKER", tmp_path / ".last_used_ts_migrated")
+    monkeypatch.setattr(pipeline.client, "get_max_batch_size", lambda: 2)
+    recent = datetime.now().isoformat()
+    for i in range(5):
+        _add(pipeline, f"m{i}", [1.0, 0.0, float(i)], last_used=recent)
+
+    assert migrate_last_used_ts(pipeline) == 5
+    metadatas = pipeline.collection.get(include=["metadatas"])["metadatas"]
+    assert all(m["last_used_ts"] > 0 for m in metadatas)
+    # Повторный запуск не читает коллекцию: маркер уже стоит
+    _add(pipeline, "late", [0.0, 1.0, 0.0], last_used=recent)
+    assert migrate_last_used_ts(pipeline) == 0
+    assert migrations.LAST_USED_TS_MARKER.exists()
+
+
+def test_query_excludes_recently_used_memories(pipeline):
+    recent = datetime.now()
+    old = recent - timedelta(days=10)
+    _add(pipeline, "recent", [1.0, 0.0, 0.0], last_used_ts=int(recent.timestamp()))
+    _add(pipeline, "old", [1.0, 0.1, 0.0], last_used_ts=int(old.timestamp()))
+    _add(pipeline, "never", [1.0, 0.2, 0.0], last_used_ts=0)
+
+    [results] = pipeline.query_similar_with_embeddings("acc", [[1.0, 0.0, 0.0]], top_k=3, days_cutoff=2)
+    assert {r["id"] for r in results} == {"old", "never"}
+
+
+def test_usage_write_back_bumps_only_usage_keys(pipeline):
+    _add(pipeline, "m", [1.0, 0.0, 0.0], frequency=1, last_used_ts=0, category="семья")
+    write_back = _UsageWriteBack(delay=60)
+    write_back.add(pipeline.collection, "m")
+    write_back.add(pipeline.collection, "m")
+    write_back.flush()
+
+    [metadata] = pipeline.collection.get(ids=["m"], include=["metadatas"])["metadatas"]
+    assert metadata["frequency"] == 3
+    assert metadata["last_used_ts"] > 0
+    assert metadata["category"] == "семья"
+
+
+def test_update_entry_replaces_metadata_but_keeps_last_used(pipeline):
+    used_at = datetime.now()
+    _add(pipeline, "m", [1.0, 0.0, 0.0], category="семья", subcategory="дети",
+         last_used=used_at.isoformat(), last_used_ts=int(used_at.timestamp()))
+
+    pipeline.update_entry("acc", "m", "m", {"category": "работа"})
+
+    [metadata] = pipeline.collection.get(ids=["m"], include=["metadatas"])["metadatas"]
+    assert metadata["category"] == "работа"
+    assert "subcategory" not in metadata
+    assert metadata["last_used_ts"] == int(used_at.timestamp())
+    assert metadata["account_id"] == "acc"
@@ -0,0 +1,28 @@
+import logging
+import os
+
+from infrastructure.utils.io_utils import yaml_safe_load
+
+logger = logging.getLogger("test_yaml_safe_load_cache")
+
+
+def test_yaml_safe_load_returns_independent_copies(tmp_path):
+    path = tmp_path / "prompts.yaml"
+    path.write_text("a:\n  b: 1\n", encoding="utf-8")
+
+    first = yaml_safe_load(path, logger)
+    first["a"]["b"] = 2
+
+    assert yaml_safe_load(path, logger) == {"a": {"b": 1}}
+
+
+def test_yaml_safe_load_rereads_changed_file(tmp_path):
+    path = tmp_path / "prompts.yaml"
+    path.write_text("a: 1\n", encoding="utf-8")
+    assert yaml_safe_load(path, logger) == {"a": 1}
+
+    path.write_text("a: 2\n", encoding="utf-8")
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert yaml_safe_load(path, logger) == {"a": 2}
@@ -19,6 +19,7 @@ from sqlalchemy import select
 
 from infrastructure.database.models import Reminder
 from infrastructure.database.session import Database
+from infrastructure.pushi.reminders_wakeup import notify_reminders_changed
 
 
 class ReminderStore:
@@ -90,6 +91,7 @@ class ReminderStore:
             session.add(new_reminder)
             session.commit()
             session.refresh(new_reminder)
+            notify_reminders_changed()
 
             return self._reminder_to_dict(new_reminder)
         finally:
@@ -138,6 +140,7 @@ class ReminderStore:
             else:
                 reminder.done = True
             session.commit()
+            notify_reminders_changed()
             return True
         finally:
             session.close()
@@ -170,6 +173,7 @@ class ReminderStore:
             reminder.datetime = reminder.datetime + delta
             reminder.done = False  # раз отложили — считаем "активным" снова
             session.commit()
+            notify_reminders_changed()
             return True
         finally:
             session.close()
@@ -214,6 +218,7 @@ class ReminderStore:
                 # Если включаем weekly — напоминание должно быть активным
                 reminder.done = False
             session.commit()
+            notify_reminders_changed()
             return True
         finally:
             session.close()